@@ -2,6 +2,11 @@ import os
 import sys
 import subprocess
 import importlib.util
+import multiprocessing
+
+if __name__ == "__main__":
+    # A frozen child process started by IsolatedReader stops here
+    multiprocessing.freeze_support()
 
 # --- Auto-Installation of Dependencies ---
 def install_and_import(package, import_name=None):
@@ -22,48 +27,44 @@ required_packages = [
     ("PyQt6-Fluent-Widgets", "qfluentwidgets")
 ]
 
-# Install missing packages
-for package, import_name in required_packages:
-    install_and_import(package, import_name)
-
-# Force qfluentwidgets to use PyQt6 (Must be set before importing qfluentwidgets)
-os.environ["QT_API"] = "pyqt6"
+# Install missing packages. Only when started as the app: IsolatedReader's
+# child processes re-import this file as __mp_main__ and only need the
+# merge engine below, not pip or the GUI.
+if __name__ == "__main__":
+    for package, import_name in required_packages:
+        install_and_import(package, import_name)
 
 import threading
 import pathlib
+import hashlib
+import json
+import gzip
+import pickle
+import time
+import concurrent.futures
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+import asyncio
+import contextlib
+import functools
+import inspect
 from copy import copy
-from datetime import datetime
+import re
+import bisect
+from datetime import datetime, date
 import webbrowser
 import platform
 import warnings
+import weakref
 
 # Now safe to import
 import openpyxl
 from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
-
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize
-from PyQt6.QtWidgets import (
-    QApplication, QFileDialog, QTableWidgetItem, QHeaderView, QFrame, 
-    QVBoxLayout, QHBoxLayout, QWidget, QSizePolicy
-)
-from PyQt6.QtGui import QIcon, QColor, QFont
-
-# Create QApplication BEFORE importing qfluentwidgets to avoid "Must construct a QApplication" error
-# This is necessary because qfluentwidgets might initialize widgets at module level or during import
-if QApplication.instance() is None:
-    app = QApplication(sys.argv)
-else:
-    app = QApplication.instance()
-
-from qfluentwidgets import (
-    FluentWindow, SubtitleLabel, PrimaryPushButton, LineEdit, PushButton, 
-    TableWidget, CheckBox, ProgressBar, TextEdit, 
-    InfoBar, InfoBarPosition, Theme, setTheme, setThemeColor,
-    StrongBodyLabel, CaptionLabel, BodyLabel, CardWidget,
-    TransparentToolButton, FluentIcon as FIF,
-    TitleLabel, ComboBox, SwitchButton
-)
+from openpyxl.worksheet.cell_range import MultiCellRange
+from openpyxl.worksheet.worksheet import Worksheet
+from openpyxl.worksheet.formula import ArrayFormula, DataTableFormula
+from openpyxl.utils import get_column_letter, column_index_from_string, range_boundaries
 
 # Suppress warnings about data validation
 warnings.filterwarnings('ignore', category=UserWarning)
@@ -71,6 +72,22 @@ warnings.filterwarnings('ignore', category=UserWarning)
 # --- Data Structures ---
 
 
+class MergeCancelled(Exception):
+    """Raised inside a merge once its cancel event has been set."""
+
+
+class SheetLimitExceeded(Exception):
+    """Raised while a sheet is copied once it goes over a ResourceGuard limit."""
+
+
+class PartSaveFailed(Exception):
+    """Raised between sheets once a background save of an output part failed."""
+
+
+class CacheEntryUnreadable(Exception):
+    """Raised while replaying a SheetCache entry that cannot be read (it is deleted)."""
+
+
 class ExcelFileInfo:
     """Stores metadata about an Excel file found in the scan."""
     def __init__(self, path, display_name):
@@ -78,6 +95,8 @@ class ExcelFileInfo:
         self.display_name = display_name
         self.sheet_names = []
         self.sheet_count = 0
+        self.sheet_dimensions = {}  # sheet name -> (rows, columns) of the used range
+        self.manifest = None  # WorkbookManifest recorded at scan time
         self.selected = True  # Default to checked
 
 
@@ -90,11 +109,491 @@ class MergeSettings:
         self.output_filename = "MergedWorkbook.xlsx"
         self.create_index_sheet = False
         self.preserve_formulas = True
+        # Re-read the output after saving and compare it with the sources
+        self.verify_output = False
+        # Keep one copy of sheets whose converted content is identical;
+        # sheets up to dedupe_max_cells are fingerprinted before copying,
+        # larger ones while copying (and dropped again if duplicate)
+        self.dedupe_sheets = False
+        self.dedupe_max_cells = 100_000
+        # Stop copying at the last row/column holding content, dropping
+        # trailing empty-but-styled cells, rows and columns
+        self.trim_used_range = False
+        # Share one object per distinct string value across the whole merge
+        self.intern_strings = True
+        # Build the structure (widths, merges, validations, CF, tables) of
+        # sheets sharing a template once per output workbook and replay it
+        self.reuse_templates = True
+        # On-disk cache of converted sheets (see SheetCache)
+        self.use_sheet_cache = False
+        self.cache_folder = pathlib.Path.home() / ".advance_excel_merger" / "sheet_cache"
+        self.cache_max_mb = 2048
+        # Only plan the merge and report it, without copying anything
+        self.dry_run = False
+        # Roll over into Name_001.xlsx, Name_002.xlsx, ... (0 = no limit)
+        self.split_max_sheets = 0
+        self.split_max_cells = 0
+        self.split_max_mb = 0
+        # Keep only rows matching ALL of these RowFilter predicates; rows up to
+        # and including filter_header_row are always kept
+        self.row_filters = []
+        self.filter_header_row = 1
+        # Per-sheet resource limits, all off (0) by default, see ResourceGuard.
+        # A sheet with too many cells is skipped, one with too many merged
+        # ranges or CF rules is copied values-only; time and memory are
+        # checked as it is copied. Memory growth is measured for the whole
+        # process and not checked while other merges run in it
+        self.max_sheet_cells = 0
+        self.max_merged_ranges = 0
+        self.max_cf_rules = 0
+        self.max_sheet_seconds = 0
+        self.max_memory_growth_mb = 0
+        # Read files that declare more cells than max_sheet_cells or hold a
+        # worksheet part over isolate_part_mb in a separate process, bounded
+        # by max_file_seconds and (where supported) max_file_memory_mb
+        self.isolate_risky_files = False
+        self.isolate_part_mb = 100
+        self.max_file_seconds = 3600
+        self.max_file_memory_mb = 8192
+
+
+class RowFilter:
+    """
+    A row predicate evaluated while rows are read.
+
+    ``column`` is the header text of that column in the header row, or a
+    column letter written as ``"col:C"``; a bare ``"C"`` is a header name.
+    ``value`` is a scalar, a ``(low, high)`` pair for ``between`` and an
+    iterable for ``in`` / ``not in``.
+    """
+
+    OPERATORS = ("==", "!=", "<=", ">=", "<", ">", "between", "not in", "in")
+
+    def __init__(self, column, op, value):
+        if op not in RowFilter.OPERATORS:
+            raise ValueError(f"Unknown filter operator: {op}")
+        self.column = column
+        self.op = op
+        if op in ("in", "not in"):
+            value = frozenset(value)
+        elif op == "between":
+            value = tuple(value)
+        self.value = value
+
+    def __repr__(self):
+        value = sorted(self.value, key=repr) if isinstance(self.value, frozenset) else self.value
+        return f"RowFilter({self.column!r}, {self.op!r}, {value!r})"
+
+    COLUMN_PREFIX = "col:"
+
+    def resolve(self, header_values):
+        """1-based column index on a sheet with ``header_values``, or None."""
+        column = str(self.column).strip()
+        if column.lower().startswith(RowFilter.COLUMN_PREFIX):
+            letter = column[len(RowFilter.COLUMN_PREFIX):].strip().upper()
+            try:
+                return column_index_from_string(letter) if letter.isalpha() else None
+            except ValueError:
+                return None
+        for idx, header in enumerate(header_values, start=1):
+            if header is not None and str(header).strip().lower() == column.lower():
+                return idx
+        return None
+
+    @staticmethod
+    def resolve_all(row_filters, header_values):
+        """``[(column index, filter), ...]``, or None if any column is missing."""
+        resolved = []
+        for row_filter in row_filters:
+            col_idx = row_filter.resolve(header_values)
+            if col_idx is None:
+                return None
+            resolved.append((col_idx, row_filter))
+        return resolved
+
+    @staticmethod
+    def row_matches(resolved, row_values):
+        for col_idx, row_filter in resolved:
+            value = row_values[col_idx - 1] if col_idx <= len(row_values) else None
+            if not row_filter.matches(value):
+                return False
+        return True
+
+    def matches(self, cell_value):
+        op, value = self.op, self.value
+        if op in ("in", "not in"):
+            found = any(RowFilter._compare(cell_value, v) == 0 for v in value)
+            return found if op == "in" else not found
+        if op == "between":
+            low = RowFilter._compare(cell_value, value[0])
+            high = RowFilter._compare(cell_value, value[1])
+            return low is not None and high is not None and low >= 0 and high <= 0
+
+        result = RowFilter._compare(cell_value, value)
+        if result is None:
+            # Values of different kinds never compare equal
+            return op == "!="
+        return {
+            "==": result == 0,
+            "!=": result != 0,
+            "<": result < 0,
+            "<=": result <= 0,
+            ">": result > 0,
+            ">=": result >= 0,
+        }[op]
+
+    @staticmethod
+    def _compare(a, b):
+        """-1/0/1 like cmp(), or None when ``a`` and ``b`` cannot be compared."""
+        if isinstance(a, datetime) or isinstance(b, datetime):
+            a, b = RowFilter._as_datetime(a), RowFilter._as_datetime(b)
+        elif isinstance(a, (int, float)) and not isinstance(a, bool):
+            b = RowFilter._as_number(b)
+        elif isinstance(b, (int, float)) and not isinstance(b, bool):
+            # Numbers stored as text compare as numbers; other text does not compare
+            a = RowFilter._as_number(a)
+        elif isinstance(a, str) or isinstance(b, str):
+            a = str(a).strip().lower() if a is not None else None
+            b = str(b).strip().lower() if b is not None else None
+        if a is None or b is None:
+            return None
+        try:
+            return (a > b) - (a < b)
+        except TypeError:
+            return None
+
+    @staticmethod
+    def _as_datetime(value):
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, date):
+            return datetime(value.year, value.month, value.day)
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value.strip())
+            except ValueError:
+                return None
+        return None
+
+    @staticmethod
+    def _as_number(value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        try:
+            return float(str(value).strip())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _parse_value(text):
+        text = text.strip()
+        if len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'":
+            return text[1:-1]
+        for cast in (int, float):
+            try:
+                return cast(text)
+            except ValueError:
+                pass
+        try:
+            return datetime.fromisoformat(text)
+        except ValueError:
+            return text
+
+    @staticmethod
+    def parse(text):
+        """
+        Parse ``;``-separated clauses such as
+        ``Region in North, South; Date between 2026-07-01 and 2026-09-30; col:C >= 100``.
+        """
+        filters = []
+        for clause in (c.strip() for c in text.split(";")):
+            if not clause:
+                continue
+            lowered = clause.lower()
+            for op in RowFilter.OPERATORS:
+                if op.isalpha() or " " in op:
+                    marker = f" {op} "
+                    pos = lowered.find(marker)
+                else:
+                    marker = op
+                    pos = clause.find(op)
+                if pos <= 0:
+                    continue
+                column = clause[:pos].strip()
+                rest = clause[pos + len(marker):].strip()
+                if op == "between":
+                    parts = re.split(r"\s+and\s+", rest, maxsplit=1, flags=re.IGNORECASE)
+                    if len(parts) != 2:
+                        raise ValueError(f"Expected 'between <low> and <high>': {clause}")
+                    value = (RowFilter._parse_value(parts[0]), RowFilter._parse_value(parts[1]))
+                elif op in ("in", "not in"):
+                    value = [RowFilter._parse_value(v) for v in rest.split(",") if v.strip()]
+                else:
+                    value = RowFilter._parse_value(rest)
+                filters.append(RowFilter(column.strip("\"'"), op, value))
+                break
+            else:
+                raise ValueError(f"Could not parse filter: {clause}")
+        return filters
+
+
+class RowMap:
+    """
+    Old -> new row numbers for a sheet whose rows are being filtered.
+
+    Kept rows are renumbered consecutively; rows past the last row read keep
+    their offset from it, so ranges reaching below the data still map.
+    Rows must be kept or rejected in ascending order.
+    """
+
+    CELL_RE = re.compile(r"^(\$?)([A-Za-z]{1,3})(\$?)(\d+)$")
+    ROW_RE = re.compile(r"^(\$?)(\d+)$")
+
+    def __init__(self, sheet_title=None):
+        self.identity = True
+        self._old = []
+        self._new = []
+        self._last = 0  # last row kept or rejected
+        self.sheet_title = sheet_title  # references qualified with it are remapped too
+        self.external_refs = 0  # references to other sheets left as they are
+
+    def keep(self, old_row):
+        new_row = self._new[-1] + 1 if self._new else 1
+        if new_row != old_row:
+            self.identity = False
+        self._old.append(old_row)
+        self._new.append(new_row)
+        self._last = old_row
+        return new_row
+
+    def reject(self, old_row):
+        self.identity = False
+        self._last = old_row
+
+    def _beyond(self, old_row):
+        return (self._new[-1] if self._new else 0) + (old_row - self._last)
+
+    def get(self, old_row):
+        """New row number, or None if the row was filtered out."""
+        if self.identity:
+            return old_row
+        if old_row > self._last:
+            return self._beyond(old_row)
+        idx = bisect.bisect_left(self._old, old_row)
+        if idx < len(self._old) and self._old[idx] == old_row:
+            return self._new[idx]
+        return None
+
+    def _remap_span(self, min_row, max_row):
+        """New ``(min_row, max_row)`` of the kept rows in a span, or None."""
+        if min_row > self._last:
+            new_min = self._beyond(min_row)
+        else:
+            idx = bisect.bisect_left(self._old, min_row)
+            new_min = self._new[idx] if idx < len(self._old) else self._beyond(self._last + 1)
+        if max_row <= self._last:
+            idx = bisect.bisect_right(self._old, max_row) - 1
+            new_max = self._new[idx] if idx >= 0 else None
+        else:
+            new_max = self._beyond(max_row)
+        if new_max is None or new_min > new_max:
+            return None
+        return new_min, new_max
+
+    def remap_range(self, ref):
+        """Remap a space-separated list of ranges; None if nothing survives."""
+        if self.identity:
+            return str(ref)
+        parts = []
+        for part in str(ref).split():
+            min_col, min_row, max_col, max_row = range_boundaries(part)
+            span = self._remap_span(min_row, max_row)
+            if span is None:
+                continue
+            parts.append(
+                f"{get_column_letter(min_col)}{span[0]}:{get_column_letter(max_col)}{span[1]}"
+            )
+        return " ".join(parts) or None
+
+    def remap_formula(self, formula):
+        """
+        Point the row references of ``formula`` at the renumbered rows.
+
+        Single cells on a row that was filtered out become ``#REF!``, ranges
+        shrink to their kept rows. References to other sheets are left
+        as they are and counted in ``external_refs``.
+        """
+        if self.identity or not isinstance(formula, str) or not formula.startswith("="):
+            return formula
+        from openpyxl.formula.tokenizer import Tokenizer, Token
+        try:
+            tokens = Tokenizer(formula).items
+        except Exception:
+            return formula
+        parts = ["="]
+        for token in tokens:
+            if token.type == Token.OPERAND and token.subtype == Token.RANGE:
+                parts.append(self._remap_reference(token.value))
+            else:
+                parts.append(token.value)
+        return "".join(parts)
+
+    def _remap_reference(self, ref):
+        prefix = ""
+        if "!" in ref:
+            sheet, _, local = ref.rpartition("!")
+            title = sheet[1:-1].replace("''", "'") if sheet.startswith("'") else sheet
+            if self.sheet_title is None or title.lower() != self.sheet_title.lower():
+                self.external_refs += 1
+                return ref
+            prefix, ref = sheet + "!", local
+        ends = ref.split(":")
+        if len(ends) > 2:
+            return ref
+        matches = [RowMap.CELL_RE.match(end) or RowMap.ROW_RE.match(end) for end in ends]
+        if not all(matches):
+            return ref  # a name, whole columns or an error literal
+        rows = [int(m.groups()[-1]) for m in matches]
+
+        if len(ends) == 1:
+            new_row = self.get(rows[0])
+            if new_row is None:
+                return "#REF!"
+            new_rows = [new_row]
+        else:
+            span = self._remap_span(min(rows), max(rows))
+            if span is None:
+                return "#REF!"
+            new_rows = list(span) if rows[0] <= rows[1] else list(reversed(span))
+
+        remapped = []
+        for m, new_row in zip(matches, new_rows):
+            groups = m.groups()
+            remapped.append("".join(groups[:-1]) + str(new_row))
+        return prefix + ":".join(remapped)
+
+
+class PlannedSheet:
+    """One source sheet and where it is expected to land in the output."""
+    def __init__(self, file_index, file_info, sheet_name, output_name, estimated_cells):
+        self.file_index = file_index
+        self.file_info = file_info
+        self.sheet_name = sheet_name
+        self.output_name = output_name
+        self.estimated_cells = estimated_cells
+
+
+class MergePlan:
+    """Planned output sheets with cell-count estimates from scan-time dimensions."""
+
+    DEFAULT_CELLS_PER_SECOND = 10000  # rough openpyxl copy throughput incl. styles
+    BYTES_PER_CELL = 10  # compressed bytes per cell, for sheets without a dimension
+    MAX_CELLS_PER_BYTE = 5  # densest plausible packing; caps bogus <dimension> refs
+    MAX_SHEET_CELLS = 1048576 * 16384  # Excel's own grid limit
+
+    def __init__(self):
+        self.sheets = []
+        self.total_cells = 0
+        self._by_key = {}
+
+    def add(self, planned):
+        self.sheets.append(planned)
+        self.total_cells += planned.estimated_cells
+        self._by_key[(planned.file_index, planned.sheet_name)] = planned
+
+    def estimated_cells(self, file_index, sheet_name):
+        planned = self._by_key.get((file_index, sheet_name))
+        if planned is not None:
+            return planned.estimated_cells
+        # Sheet unknown at scan time: assume an average one
+        return max(self.total_cells // max(len(self.sheets), 1), 1)
+
+    def estimate_seconds(self, cells_per_second=None):
+        return self.total_cells / (cells_per_second or MergePlan.DEFAULT_CELLS_PER_SECOND)
 
 
 # --- Core Logic Classes ---
 
 
+class WorkbookManifest:
+    """
+    What the scan learned about one .xlsx/.xlsm package, reusable by the merge.
+
+    Read straight from the zip: the sheet list and sheet name -> worksheet
+    part mapping from workbook.xml and its rels, each part's unpacked size and
+    each sheet's ``<dimension>``. ``size``/``mtime_ns`` tell the merge whether
+    the file changed since; ``digest`` memoizes the content hash used by
+    ``SheetCache``.
+    """
+
+    NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+    NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+    NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+    DIMENSION_RE = re.compile(rb"<(?:\w+:)?dimension\s+ref=\"([A-Z]+\d+(?::[A-Z]+\d+)?)\"")
+    DIMENSION_SCAN_BYTES = 64 * 1024  # <dimension> precedes <sheetData>
+
+    def __init__(self, path):
+        self.path = pathlib.Path(path)
+        self.size = 0
+        self.mtime_ns = 0
+        self.part_sizes = {}  # zip entry -> unpacked size
+        self.sheet_names = []
+        self.sheet_parts = {}  # sheet name -> zip entry of its part
+        self.dimensions = {}  # sheet name -> (rows, columns)
+        self.digest = None
+
+    @staticmethod
+    def read(path):
+        manifest = WorkbookManifest(path)
+        st = manifest.path.stat()
+        manifest.size = st.st_size
+        manifest.mtime_ns = st.st_mtime_ns
+
+        with zipfile.ZipFile(manifest.path) as zf:
+            for info in zf.infolist():
+                manifest.part_sizes[info.filename] = info.file_size
+
+            targets = {}
+            rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+            for rel in rels.iter(f"{WorkbookManifest.NS_PKG_REL}Relationship"):
+                target = rel.get("Target", "")
+                if target.startswith("/"):
+                    target = target[1:]
+                else:
+                    target = posixpath.normpath(posixpath.join("xl", target))
+                targets[rel.get("Id")] = target
+
+            workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+            for sheet in workbook.iter(f"{WorkbookManifest.NS_MAIN}sheet"):
+                name = sheet.get("name")
+                manifest.sheet_names.append(name)
+                part = targets.get(sheet.get(f"{WorkbookManifest.NS_REL}id"))
+                if part:
+                    manifest.sheet_parts[name] = part
+
+            for name, part in manifest.sheet_parts.items():
+                if part not in manifest.part_sizes or "worksheets/" not in part:
+                    continue
+                with zf.open(part) as f:
+                    head = f.read(WorkbookManifest.DIMENSION_SCAN_BYTES)
+                match = WorkbookManifest.DIMENSION_RE.search(head)
+                if match:
+                    ref = match.group(1).decode("ascii")
+                    if ":" not in ref:
+                        ref = f"{ref}:{ref}"
+                    _, _, max_col, max_row = range_boundaries(ref)
+                    manifest.dimensions[name] = (max_row, max_col)
+        return manifest
+
+    def is_current(self):
+        """True if the file on disk still has the size and mtime seen at scan time."""
+        try:
+            st = self.path.stat()
+        except OSError:
+            return False
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+
 class FolderScanner:
     """Responsible for finding Excel files and extracting metadata."""
 
@@ -117,6 +616,14 @@ class FolderScanner:
 
             info = ExcelFileInfo(file_path, file_path.name)
 
+            try:
+                FolderScanner.apply_manifest(info, WorkbookManifest.read(file_path))
+                found_files.append(info)
+                continue
+            except Exception:
+                # Unusual package layout: fall back to openpyxl
+                pass
+
             try:
                 wb = load_workbook(
                     file_path,
@@ -126,6 +633,14 @@ class FolderScanner:
                 )
                 info.sheet_names = wb.sheetnames
                 info.sheet_count = len(info.sheet_names)
+                for sheet_name in info.sheet_names:
+                    # Read-only sheets report the <dimension> tag; None if absent
+                    try:
+                        ws = wb[sheet_name]
+                        if ws.max_row and ws.max_column:
+                            info.sheet_dimensions[sheet_name] = (ws.max_row, ws.max_column)
+                    except Exception:
+                        pass
                 wb.close()
                 found_files.append(info)
             except Exception as e:
@@ -134,6 +649,28 @@ class FolderScanner:
         found_files.sort(key=lambda x: str(x.path).lower())
         return found_files
 
+    @staticmethod
+    def apply_manifest(info, manifest):
+        info.manifest = manifest
+        info.sheet_names = list(manifest.sheet_names)
+        info.sheet_count = len(info.sheet_names)
+        info.sheet_dimensions = dict(manifest.dimensions)
+
+    @staticmethod
+    def refresh_if_changed(info, log_cb):
+        """
+        Re-read a file's metadata if it changed since the scan.
+
+        Returns True when the scan-time manifest is still valid.
+        """
+        if info.manifest is None:
+            return False
+        if info.manifest.is_current():
+            return True
+        log_cb(f"  {info.display_name} changed since the scan, re-reading its metadata")
+        FolderScanner.apply_manifest(info, WorkbookManifest.read(info.path))
+        return False
+
 
 class EnhancedSheetCopier:
     """
@@ -145,286 +682,1718 @@ class EnhancedSheetCopier:
     - Copies freeze panes
     - DOES NOT copy tables, CF, charts, defined names, etc.
       (this avoids all Excel XML corruption issues)
+
+    A copy runs in two halves: ``iter_records`` reads the source sheet into a
+    stream of plain, picklable records and ``apply_records`` replays them onto
+    the target workbook. The stream is what ``SheetCache`` stores on disk.
     """
 
     @staticmethod
     def copy_sheet(source_ws, target_wb, new_title, preserve_formulas=True):
-        # Excel sheet name max 31 chars, no :\\/?*[]
-        safe_title = (
-            new_title
-            .replace(":", "_")
-            .replace("/", "_")
-            .replace("\\", "_")
-            .replace("?", "_")
-            .replace("*", "_")
-            .replace("[", "_")
-            .replace("]", "_")
-        )[:31]
+        records = EnhancedSheetCopier.iter_records(source_ws, preserve_formulas)
+        return EnhancedSheetCopier.apply_records(records, target_wb, new_title)
 
-        base = safe_title or "Sheet"
-        final = base
-        c = 1
-        while final in target_wb.sheetnames:
-            final = (base[:28] + "_" + str(c))[:31]
-            c += 1
+    @staticmethod
+    def iter_records(source_ws, preserve_formulas=True, row_filters=None, header_row=1,
+                     trim_used_range=False, values_only=False, guard=None):
+        """
+        Yield the converted form of ``source_ws`` as ``(kind, ...)`` tuples.
+
+        With ``row_filters``, rows below ``header_row`` that fail any filter are
+        skipped before their cells are copied, kept rows are renumbered and
+        merged cells, validations, CF and tables are remapped to match. With
+        ``trim_used_range``, rows and columns past the last one holding a
+        value, merged range or table are not copied. ``values_only`` drops
+        cell styles and all sheet structure. ``guard`` (a ``ResourceGuard``)
+        is ticked per row. The last record is ``("stats", {...})`` with row
+        counts, the used-range check and ``notices`` for the merge log.
+        """
+        notices = []
+
+        # 1-5. Sheet-level properties
+        props = {}
+        try:
+            if source_ws.sheet_properties.tabColor:
+                props["tabColor"] = copy(source_ws.sheet_properties.tabColor)
+        except Exception:
+            pass
 
-        target_ws = target_wb.create_sheet(final)
+        try:
+            props["sheet_state"] = source_ws.sheet_state
+        except Exception:
+            pass
+
+        try:
+            if source_ws.freeze_panes:
+                props["freeze_panes"] = source_ws.freeze_panes
+        except Exception:
+            pass
+
+        try:
+            if source_ws.page_setup:
+                props["page_setup"] = {
+                    "orientation": source_ws.page_setup.orientation,
+                    "paperSize": source_ws.page_setup.paperSize,
+                    "fitToPage": source_ws.page_setup.fitToPage,
+                    "fitToHeight": source_ws.page_setup.fitToHeight,
+                    "fitToWidth": source_ws.page_setup.fitToWidth,
+                }
+        except Exception:
+            pass
 
         try:
-            # 1. Sheet properties
+            if source_ws.print_options:
+                props["print_options"] = {
+                    "horizontalCentered": source_ws.print_options.horizontalCentered,
+                    "verticalCentered": source_ws.print_options.verticalCentered,
+                }
+        except Exception:
+            pass
+
+        yield ("sheet", props)
+
+        # Used range: what the sheet declares vs. where its content ends
+        declared_rows, declared_cols = EnhancedSheetCopier.declared_extent(source_ws)
+        content_rows, content_cols = EnhancedSheetCopier.content_extent(source_ws)
+        bloated = EnhancedSheetCopier.is_bloated(
+            declared_rows * declared_cols, content_rows * content_cols
+        )
+        trim = trim_used_range and (content_rows < declared_rows or content_cols < declared_cols)
+
+        # 6. Column widths, identical neighbours collapsed into one range
+        if not values_only:
+            for col_min, col_max, width, hidden in EnhancedSheetCopier._column_runs(
+                source_ws, content_cols if trim_used_range else None
+            ):
+                yield ("col", col_min, col_max, width, hidden)
+
+        # Resolve filter columns against the header row; a sheet without one
+        # of the filtered columns is copied unfiltered
+        active_filters = []
+        if row_filters:
             try:
-                if source_ws.sheet_properties.tabColor:
-                    target_ws.sheet_properties.tabColor = copy(source_ws.sheet_properties.tabColor)
+                header_values = [c.value for c in source_ws[header_row]] if source_ws.max_row >= header_row else []
             except Exception:
-                pass
+                header_values = []
+            active_filters = RowFilter.resolve_all(row_filters, header_values)
+            if active_filters is None:
+                notices.append("filter column not found, sheet kept unfiltered")
+                active_filters = []
+
+        row_map = RowMap(source_ws.title)
+        rows_read = rows_kept = 0
+        last_row = (content_rows if trim else source_ws.max_row) if source_ws._cells else 0
+        if trim and not content_cols:
+            last_row = 0
+
+        # Decide every row up front, so formulas can be remapped against
+        # rows below them as well as above
+        if active_filters:
+            filter_cols = max(col_idx for col_idx, _ in active_filters)
+            for old_row, values in enumerate(
+                source_ws.iter_rows(max_row=last_row, max_col=filter_cols, values_only=True), start=1
+            ):
+                if old_row > header_row and not RowFilter.row_matches(active_filters, values):
+                    row_map.reject(old_row)
+                else:
+                    row_map.keep(old_row)
+
+        # 9. Cell values + styles
+        if not last_row:
+            rows = ()
+        elif not trim:
+            rows = source_ws.iter_rows()
+        else:
+            rows = source_ws.iter_rows(max_row=content_rows, max_col=content_cols)
+        for row in rows:
+            if not row:
+                continue
+            if guard is not None:
+                guard.tick(len(row))
+            old_row = row[0].row
+            rows_read += 1
+            if active_filters:
+                new_row = row_map.get(old_row)
+                if new_row is None:
+                    continue
+            else:
+                new_row = row_map.keep(old_row)
+            rows_kept += 1
+
+            for cell in row:
+                try:
+                    # Formulas are carried as their "=..." text
+                    if preserve_formulas and cell.data_type == 'f':
+                        value = row_map.remap_formula(cell.value if cell.value else "")
+                    else:
+                        value = cell.value
+
+                    if values_only:
+                        yield ("cell", new_row, cell.column, value, None, None, None, None, None, None)
+                        continue
+
+                    yield (
+                        "cell",
+                        new_row,
+                        cell.column,
+                        value,
+                        copy(cell.font) if cell.font else None,
+                        copy(cell.border) if cell.border else None,
+                        copy(cell.fill) if cell.fill else None,
+                        cell.number_format or None,
+                        copy(cell.alignment) if cell.alignment else None,
+                        copy(cell.protection) if cell.protection else None,
+                    )
+                except Exception:
+                    continue
+
+        if row_map.external_refs:
+            notices.append(
+                f"{row_map.external_refs:,} formula reference(s) to other sheets were not "
+                "adjusted for the filtered rows"
+            )
+
+        if not values_only:
+            yield from EnhancedSheetCopier._iter_structure(
+                source_ws, row_map, content_rows if trim_used_range else None
+            )
+
+        yield ("stats", {
+            "rows_read": rows_read,
+            "rows_kept": rows_kept,
+            "declared_range": EnhancedSheetCopier._extent_ref(declared_rows, declared_cols),
+            "content_range": EnhancedSheetCopier._extent_ref(content_rows, content_cols),
+            "bloated": bloated,
+            "trimmed": trim,
+            "notices": notices,
+        })
 
-            # 2. Sheet state (visible, hidden, very hidden)
+    @staticmethod
+    def _iter_structure(source_ws, row_map, max_row=None):
+        """Yield the row, merge, validation, CF and table records of ``source_ws``."""
+        # 7. Row heights (after cells so filtered rows can be renumbered)
+        for r, rd_src in source_ws.row_dimensions.items():
             try:
-                target_ws.sheet_state = source_ws.sheet_state
+                if max_row is not None and r > max_row:
+                    continue
+                new_r = row_map.get(r)
+                if new_r is not None:
+                    yield ("row", new_r, rd_src.height, rd_src.hidden)
             except Exception:
                 pass
 
-            # 3. Freeze panes
+        # 8/10. Merged cells AFTER all cells
+        for merged in source_ws.merged_cells.ranges:
+            try:
+                merged_range = row_map.remap_range(merged)
+            except Exception:
+                continue
+            if merged_range:
+                yield ("merge", merged_range)
+
+        # 11. Data validations; the source object is passed as-is and only
+        # copied on the target side (once per template, see TemplateCache)
+        try:
+            if hasattr(source_ws, 'data_validations') and source_ws.data_validations:
+                for dv in source_ws.data_validations.dataValidation:
+                    sqref = row_map.remap_range(dv.sqref)
+                    if sqref:
+                        yield ("dv", sqref, dv)
+        except Exception:
+            pass
+
+        # 12. Conditional formatting (the rule carries its own DXF style)
+        try:
+            if hasattr(source_ws, 'conditional_formatting') and source_ws.conditional_formatting:
+                for cf_range, cf_rules in source_ws.conditional_formatting._cf_rules.items():
+                    try:
+                        sqref = row_map.remap_range(cf_range.sqref)
+                        if not sqref:
+                            continue
+                        for rule in cf_rules:
+                            yield ("cf", sqref, rule)
+                    except Exception:
+                        pass
+        except Exception:
+            pass
+
+        # 13. Excel Tables
+        try:
+            if hasattr(source_ws, 'tables') and source_ws.tables:
+                for table_name in source_ws.tables:
+                    try:
+                        source_table = source_ws.tables[table_name]
+                        style = None
+                        if hasattr(source_table, 'tableStyleInfo') and source_table.tableStyleInfo:
+                            style = {
+                                "name": source_table.tableStyleInfo.name,
+                                "showFirstColumn": source_table.tableStyleInfo.showFirstColumn,
+                                "showLastColumn": source_table.tableStyleInfo.showLastColumn,
+                                "showRowStripes": source_table.tableStyleInfo.showRowStripes,
+                                "showColumnStripes": source_table.tableStyleInfo.showColumnStripes,
+                            }
+                        ref = row_map.remap_range(source_table.ref)
+                        if ref:
+                            yield ("table", source_table.displayName, ref, style)
+                    except Exception as e:
+                        print(f"  Warning: Could not read table '{table_name}': {e}")
+        except Exception as e:
+            print(f"Warning: Error reading tables: {e}")
+
+    BLOAT_MIN_EXTRA_CELLS = 10_000  # declared-but-empty cells before a range counts as bloated
+    BLOAT_RATIO = 4  # ... and declared cells per content cell
+
+    @staticmethod
+    def declared_extent(source_ws):
+        """(last row, last column) with a cell, row height or column width; (0, 0) if none."""
+        max_row = source_ws.max_row if source_ws._cells else 0
+        max_col = source_ws.max_column if source_ws._cells else 0
+        try:
+            max_row = max(max_row, max(source_ws.row_dimensions.keys(), default=0))
+        except Exception:
+            pass
+        for col_letter, col_dim in source_ws.column_dimensions.items():
             try:
-                if source_ws.freeze_panes:
-                    target_ws.freeze_panes = source_ws.freeze_panes
+                max_col = max(max_col, col_dim.max or column_index_from_string(col_letter))
             except Exception:
                 pass
+        return max_row, max_col
 
-            # 4. Print settings and page setup
+    @staticmethod
+    def content_extent(source_ws):
+        """(last row, last column) holding a value, merged range or table; (0, 0) if none."""
+        max_row = max_col = 0
+        for (row, col), cell in source_ws._cells.items():
+            if cell.value is not None and cell.value != "":
+                if row > max_row:
+                    max_row = row
+                if col > max_col:
+                    max_col = col
+        bounds = [str(r) for r in source_ws.merged_cells.ranges]
+        try:
+            bounds.extend(table.ref for table in source_ws.tables.values())
+        except Exception:
+            pass
+        for ref in bounds:
             try:
-                if source_ws.page_setup:
-                    target_ws.page_setup.orientation = source_ws.page_setup.orientation
-                    target_ws.page_setup.paperSize = source_ws.page_setup.paperSize
-                    target_ws.page_setup.fitToPage = source_ws.page_setup.fitToPage
-                    target_ws.page_setup.fitToHeight = source_ws.page_setup.fitToHeight
-                    target_ws.page_setup.fitToWidth = source_ws.page_setup.fitToWidth
+                _, _, ref_col, ref_row = range_boundaries(ref)
+                max_row = max(max_row, ref_row)
+                max_col = max(max_col, ref_col)
             except Exception:
                 pass
+        return max_row, max_col
+
+    @staticmethod
+    def is_bloated(declared_cells, content_cells):
+        extra = declared_cells - content_cells
+        return (
+            extra >= EnhancedSheetCopier.BLOAT_MIN_EXTRA_CELLS
+            and declared_cells >= EnhancedSheetCopier.BLOAT_RATIO * max(content_cells, 1)
+        )
 
-            # 5. Print options
+    @staticmethod
+    def _extent_ref(rows, cols):
+        if not rows or not cols:
+            return ""
+        return f"A1:{get_column_letter(cols)}{rows}"
+
+    @staticmethod
+    def _column_runs(source_ws, max_col=None):
+        """Yield ``(min, max, width, hidden)`` with equal adjacent columns merged."""
+        dims = []
+        for col_letter, col_dim in source_ws.column_dimensions.items():
             try:
-                if source_ws.print_options:
-                    target_ws.print_options.horizontalCentered = source_ws.print_options.horizontalCentered
-                    target_ws.print_options.verticalCentered = source_ws.print_options.verticalCentered
+                col_min = col_dim.min or column_index_from_string(col_letter)
+                col_max = col_dim.max or col_min
+                if max_col is not None:
+                    if col_min > max_col:
+                        continue
+                    col_max = min(col_max, max_col)
+                dims.append((col_min, col_max, col_dim.width, col_dim.hidden))
             except Exception:
                 pass
 
-            # 6. Column widths
-            for col_letter, col_dim in source_ws.column_dimensions.items():
-                try:
-                    td = target_ws.column_dimensions[col_letter]
-                    if col_dim.width:
-                        td.width = col_dim.width
-                    td.hidden = col_dim.hidden
-                except Exception:
-                    pass
+        run = None
+        for col_min, col_max, width, hidden in sorted(dims):
+            if run and run[1] + 1 == col_min and run[2] == width and run[3] == hidden:
+                run = (run[0], col_max, width, hidden)
+                continue
+            if run:
+                yield run
+            run = (col_min, col_max, width, hidden)
+        if run:
+            yield run
 
-            # 7. Row heights
-            for r, rd_src in source_ws.row_dimensions.items():
-                try:
-                    rd_tgt = target_ws.row_dimensions[r]
-                    if rd_src.height:
-                        rd_tgt.height = rd_src.height
-                    rd_tgt.hidden = rd_src.hidden
-                except Exception:
-                    pass
+    @staticmethod
+    def hash_records(records, hasher):
+        """Pass ``records`` through, feeding their content into ``hasher``."""
+        for record in records:
+            if record[0] != "stats":
+                hasher.update(pickle.dumps(record, protocol=4))
+            yield record
 
-            # 8. Collect merged cells (apply after cell copying)
-            merged_ranges = []
-            for merged in source_ws.merged_cells.ranges:
-                try:
-                    merged_ranges.append(str(merged))
-                except Exception:
-                    pass
-            
-            # 9. Cell values + styles (Direct Copy)
-            for row in source_ws.iter_rows():
-                for cell in row:
+    @staticmethod
+    def fingerprint(records):
+        """Content fingerprint of a converted sheet (independent of its name)."""
+        hasher = hashlib.blake2b(digest_size=16)
+        for _ in EnhancedSheetCopier.hash_records(records, hasher):
+            pass
+        return hasher.hexdigest()
+
+    PROGRESS_EVERY = 5000  # cells between progress callbacks
+
+    @staticmethod
+    def apply_records(records, target_wb, new_title, progress_cb=None, stats=None,
+                      interner=None, templates=None):
+        """
+        Create ``new_title`` in ``target_wb`` and replay ``records`` onto it.
+
+        ``progress_cb(cells_done)`` is called every ``PROGRESS_EVERY`` cells;
+        the trailing ``stats`` record, if any, is merged into ``stats``.
+        String values go through ``interner`` (a ``StringInterner``) and the
+        sheet structure through ``templates`` (a ``TemplateCache``) if given.
+        """
+        # Excel sheet name max 31 chars, no :\\/?*[]
+        safe_title = (
+            new_title
+            .replace(":", "_")
+            .replace("/", "_")
+            .replace("\\", "_")
+            .replace("?", "_")
+            .replace("*", "_")
+            .replace("[", "_")
+            .replace("]", "_")
+        )[:31]
+
+        base = safe_title or "Sheet"
+        final = base
+        c = 1
+        while final in target_wb.sheetnames:
+            final = (base[:28] + "_" + str(c))[:31]
+            c += 1
+
+        target_ws = target_wb.create_sheet(final)
+        cells_done = 0
+        structure = []
+
+        try:
+            for record in records:
+                kind = record[0]
+
+                # 9. Cell values + styles (Direct Copy)
+                if kind == "cell":
+                    cells_done += 1
+                    if progress_cb is not None and cells_done % EnhancedSheetCopier.PROGRESS_EVERY == 0:
+                        progress_cb(cells_done)
                     try:
-                        # Get target cell
-                        target_cell = target_ws.cell(row=cell.row, column=cell.column)
-                        
-                        # Copy value or formula
-                        if preserve_formulas and cell.data_type == 'f':
-                            try:
-                                target_cell.value = cell.value
-                            except Exception:
-                                target_cell.value = cell.value if cell.value else ""
-                        else:
-                            target_cell.value = cell.value
-                        
+                        _, row, col, value, font, border, fill, number_format, alignment, protection = record
+                        if interner is not None and type(value) is str:
+                            value = interner.intern(value)
+                        target_cell = target_ws.cell(row=row, column=col)
+                        target_cell.value = value
+
                         # Copy formatting
                         try:
-                            if cell.font: target_cell.font = copy(cell.font)
+                            if font: target_cell.font = font
                         except: pass
-                        
+
                         try:
-                            if cell.border: target_cell.border = copy(cell.border)
+                            if border: target_cell.border = border
                         except: pass
-                        
+
                         try:
-                            if cell.fill: target_cell.fill = copy(cell.fill)
+                            if fill: target_cell.fill = fill
                         except: pass
-                        
+
                         try:
-                            if cell.number_format: target_cell.number_format = cell.number_format
+                            if number_format: target_cell.number_format = number_format
                         except: pass
-                        
+
                         try:
-                            if cell.alignment: target_cell.alignment = copy(cell.alignment)
+                            if alignment: target_cell.alignment = alignment
                         except: pass
-                        
+
                         try:
-                            if cell.protection: target_cell.protection = copy(cell.protection)
+                            if protection: target_cell.protection = protection
                         except: pass
-                    
+
                     except Exception as e:
                         continue
 
-            # 10. Apply merged cells AFTER all cells are copied
-            for merged_range in merged_ranges:
-                try:
-                    target_ws.merge_cells(merged_range)
-                except Exception:
-                    pass
-
-            # 11. Copy data validations
-            try:
-                if hasattr(source_ws, 'data_validations') and source_ws.data_validations:
-                    for dv in source_ws.data_validations.dataValidation:
-                        try:
-                            target_ws.add_data_validation(copy(dv))
-                        except Exception:
-                            pass
-            except Exception:
-                pass
+                elif kind == "sheet":
+                    EnhancedSheetCopier._apply_sheet_props(target_ws, record[1])
 
-            # 12. Copy conditional formatting AND Differential Styles (DXF)
-            try:
-                if hasattr(source_ws, 'conditional_formatting') and source_ws.conditional_formatting:
-                    # Access source workbook to get DXF styles
-                    source_wb = source_ws.parent
-                    
-                    for cf_range, cf_rules in source_ws.conditional_formatting._cf_rules.items():
-                        try:
-                            for rule in cf_rules:
-                                # Copy the rule
-                                new_rule = copy(rule)
-                                
-                                # Handle DXF (Differential Style) copying
-                                if hasattr(new_rule, 'dxfId') and new_rule.dxfId is not None:
-                                    try:
-                                        # Get source DXF style
-                                        if hasattr(source_wb, '_differential_styles') and len(source_wb._differential_styles) > new_rule.dxfId:
-                                            source_dxf = source_wb._differential_styles[new_rule.dxfId]
-                                            
-                                            # Add to target workbook if not present
-                                            if not hasattr(target_wb, '_differential_styles'):
-                                                target_wb._differential_styles = []
-                                            
-                                            # Check if this style already exists in target to reuse ID
-                                            # (Simple check might not be enough, but appending is safer for now)
-                                            target_wb._differential_styles.append(copy(source_dxf))
-                                            new_dxf_id = len(target_wb._differential_styles) - 1
-                                            
-                                            # Update rule to point to new DXF ID
-                                            new_rule.dxfId = new_dxf_id
-                                    except Exception as e:
-                                        pass
-
-                                target_ws.conditional_formatting.add(cf_range, new_rule)
-                        except Exception:
-                            pass
-            except Exception:
-                pass
+                # 6-13. Column widths, row heights, merged cells, data
+                # validations, conditional formatting and tables are applied
+                # together once the cells are in (see _apply_structure)
+                elif kind in EnhancedSheetCopier.STRUCTURE_KINDS:
+                    structure.append(record)
 
-            # 13. Copy Excel Tables (Native Object Copying)
-            try:
-                if hasattr(source_ws, 'tables') and source_ws.tables:
-                    from openpyxl.worksheet.table import Table, TableStyleInfo
-                    
-                    for table_name in source_ws.tables:
-                        try:
-                            source_table = source_ws.tables[table_name]
-                            
-                            # Create unique table name for target
-                            base_table_name = f"{final}_{source_table.displayName}"
-                            # Sanitize table name (no spaces, special chars)
-                            safe_table_name = (
-                                base_table_name
-                                .replace(" ", "_")
-                                .replace("-", "_")
-                                .replace(".", "_")
-                                .replace(":", "_")
-                                .replace("/", "_")
-                                .replace("\\", "_")
-                            )[:255]
-                            
-                            # Ensure unique table name
-                            final_table_name = safe_table_name
-                            counter = 1
-                            while final_table_name in target_ws.tables:
-                                final_table_name = f"{safe_table_name}_{counter}"
-                                counter += 1
-                            
-                            # Create new table with same range
-                            new_table = Table(
-                                displayName=final_table_name,
-                                ref=source_table.ref
-                            )
-                            
-                            # Copy table style info
-                            if hasattr(source_table, 'tableStyleInfo') and source_table.tableStyleInfo:
-                                new_table.tableStyleInfo = TableStyleInfo(
-                                    name=source_table.tableStyleInfo.name,
-                                    showFirstColumn=source_table.tableStyleInfo.showFirstColumn,
-                                    showLastColumn=source_table.tableStyleInfo.showLastColumn,
-                                    showRowStripes=source_table.tableStyleInfo.showRowStripes,
-                                    showColumnStripes=source_table.tableStyleInfo.showColumnStripes
-                                )
-                            
-                            # Add table to target worksheet
-                            target_ws.add_table(new_table)
-                            
-                        except Exception as e:
-                            print(f"  Warning: Could not copy table '{table_name}': {e}")
-                            pass
-            except Exception as e:
-                print(f"Warning: Error copying tables: {e}")
-                pass
+                elif kind == "stats":
+                    if stats is not None:
+                        stats.update(record[1])
 
+            EnhancedSheetCopier._apply_structure(target_ws, structure, templates)
             return target_ws
 
+        except MergeCancelled:
+            raise
+        except (SheetLimitExceeded, CacheEntryUnreadable):
+            # Drop the partial sheet, the caller decides what to report
+            target_wb.remove(target_ws)
+            raise
         except Exception as e:
             print(f"Copy error: {e}")
             import traceback
             traceback.print_exc()
             return target_ws
 
+    STRUCTURE_KINDS = ("col", "row", "merge", "dv", "cf", "table")
 
-
-class ExcelMerger:
-    """Orchestrator for the merge process (openpyxl-only)."""
+    @staticmethod
+    def _apply_structure(target_ws, structure, templates=None):
+        """Apply the buffered structure records, reusing a prepared template if one matches."""
+        if not structure:
+            return
+        key = prepared = None
+        if templates is not None:
+            key, prepared = templates.lookup(target_ws.parent, structure)
+        if prepared is None:
+            prepared = EnhancedSheetCopier._build_structure(target_ws, structure)
+            if templates is not None:
+                templates.store(key, prepared)
+        else:
+            EnhancedSheetCopier._replay_structure(target_ws, prepared)
 
     @staticmethod
-    def _build_sheet_name(file_index: int, sheet_name: str, existing_names) -> str:
-        """Build a collision-safe sheet name with index prefix within 31-char limit."""
-        safe_sheet = (
-            sheet_name
-            .replace(":", "_")
-            .replace("/", "_")
-            .replace("\\", "_")
-            .replace("?", "_")
-            .replace("*", "_")
-            .replace("[", "_")
-            .replace("]", "_")
-        )
-        base = f"{file_index}_{safe_sheet}"
-        if len(base) > 31:
-            prefix = f"{file_index}_"
-            remaining = max(31 - len(prefix), 1)
-            base = prefix + safe_sheet[:remaining]
+    def _build_structure(target_ws, structure):
+        """
+        Apply ``structure`` item by item, copying validations and rules.
+
+        Returns the items that applied cleanly, in the form
+        ``_replay_structure`` takes.
+        """
+        cols, rows, merges, dvs, cfs, tables = [], [], [], [], [], []
+        for record in structure:
+            kind = record[0]
+
+            # 6. Column widths
+            if kind == "col":
+                try:
+                    _, col_min, col_max, width, hidden = record
+                    td = target_ws.column_dimensions[get_column_letter(col_min)]
+                    td.min = col_min
+                    td.max = col_max
+                    if width:
+                        td.width = width
+                    td.hidden = hidden
+                    cols.append(record[1:])
+                except Exception:
+                    pass
+
+            # 7. Row heights
+            elif kind == "row":
+                try:
+                    _, r, height, hidden = record
+                    rd_tgt = target_ws.row_dimensions[r]
+                    if height:
+                        rd_tgt.height = height
+                    rd_tgt.hidden = hidden
+                    rows.append(record[1:])
+                except Exception:
+                    pass
+
+            # 10. Merged cells
+            elif kind == "merge":
+                try:
+                    target_ws.merge_cells(record[1])
+                    merges.append(record[1])
+                except Exception:
+                    pass
+
+            # 11. Data validations
+            elif kind == "dv":
+                try:
+                    new_dv = copy(record[2])
+                    new_dv.sqref = MultiCellRange(record[1])
+                    target_ws.add_data_validation(new_dv)
+                    dvs.append(new_dv)
+                except Exception:
+                    pass
+
+            # 12. Conditional formatting; openpyxl registers rule.dxf
+            # with the target workbook's differential styles on save
+            elif kind == "cf":
+                try:
+                    rule = copy(record[2])
+                    target_ws.conditional_formatting.add(record[1], rule)
+                    cfs.append((record[1], rule))
+                except Exception:
+                    pass
+
+            # 13. Excel Tables (Native Object Copying)
+            elif kind == "table":
+                try:
+                    EnhancedSheetCopier._apply_table(target_ws, target_ws.title, *record[1:])
+                    tables.append(record[1:])
+                except Exception as e:
+                    print(f"  Warning: Could not copy table '{record[1]}': {e}")
+
+        return (cols, rows, merges, dvs, cfs, tables)
+
+    @staticmethod
+    def _replay_structure(target_ws, prepared):
+        """Apply structure from ``_build_structure``, sharing its validation and rule objects."""
+        cols, rows, merges, dvs, cfs, tables = prepared
+        column_dimensions = target_ws.column_dimensions
+        for col_min, col_max, width, hidden in cols:
+            td = column_dimensions[get_column_letter(col_min)]
+            td.min = col_min
+            td.max = col_max
+            if width:
+                td.width = width
+            td.hidden = hidden
+
+        row_dimensions = target_ws.row_dimensions
+        for r, height, hidden in rows:
+            rd_tgt = row_dimensions[r]
+            if height:
+                rd_tgt.height = height
+            rd_tgt.hidden = hidden
+
+        for ref in merges:
+            target_ws.merge_cells(ref)
+
+        for dv in dvs:
+            target_ws.add_data_validation(dv)
+
+        conditional_formatting = target_ws.conditional_formatting
+        for sqref, rule in cfs:
+            conditional_formatting.add(sqref, rule)
+
+        # Table names are per sheet, so tables are always built afresh
+        for table in tables:
+            try:
+                EnhancedSheetCopier._apply_table(target_ws, target_ws.title, *table)
+            except Exception as e:
+                print(f"  Warning: Could not copy table '{table[0]}': {e}")
+
+    @staticmethod
+    def _apply_sheet_props(target_ws, props):
+        # 1. Sheet properties
+        try:
+            if props.get("tabColor"):
+                target_ws.sheet_properties.tabColor = props["tabColor"]
+        except Exception:
+            pass
+
+        # 2. Sheet state (visible, hidden, very hidden)
+        try:
+            if "sheet_state" in props:
+                target_ws.sheet_state = props["sheet_state"]
+        except Exception:
+            pass
+
+        # 3. Freeze panes
+        try:
+            if props.get("freeze_panes"):
+                target_ws.freeze_panes = props["freeze_panes"]
+        except Exception:
+            pass
+
+        # 4. Print settings and page setup
+        try:
+            for attr, value in props.get("page_setup", {}).items():
+                setattr(target_ws.page_setup, attr, value)
+        except Exception:
+            pass
+
+        # 5. Print options
+        try:
+            for attr, value in props.get("print_options", {}).items():
+                setattr(target_ws.print_options, attr, value)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _apply_table(target_ws, sheet_title, display_name, ref, style):
+        from openpyxl.worksheet.table import Table, TableStyleInfo
+
+        # Create unique table name for target
+        base_table_name = f"{sheet_title}_{display_name}"
+        # Sanitize table name (no spaces, special chars)
+        safe_table_name = (
+            base_table_name
+            .replace(" ", "_")
+            .replace("-", "_")
+            .replace(".", "_")
+            .replace(":", "_")
+            .replace("/", "_")
+            .replace("\\", "_")
+        )[:255]
+
+        # Ensure unique table name
+        final_table_name = safe_table_name
+        counter = 1
+        while final_table_name in target_ws.tables:
+            final_table_name = f"{safe_table_name}_{counter}"
+            counter += 1
+
+        # Create new table with same range
+        new_table = Table(displayName=final_table_name, ref=ref)
+
+        # Copy table style info
+        if style:
+            new_table.tableStyleInfo = TableStyleInfo(**style)
+
+        # Add table to target worksheet
+        target_ws.add_table(new_table)
+
+
+class StringInterner:
+    """
+    Merge-wide string table for copied cell values.
+
+    Every source workbook (and every cache chunk) carries its own copy of a
+    repeated string; routing values through this table makes the target
+    workbook hold a single object per distinct string until it is saved.
+    Unlike ``sys.intern`` the table is dropped with the merge.
+    """
+
+    MAX_LENGTH = 256  # longer strings are rarely repeated
+    MAX_ENTRIES = 1_000_000
+    WARMUP_LOOKUPS = 100_000  # lookups before the hit rate is judged
+    MIN_HIT_RATE = 0.05  # below this the table costs more than it saves
+
+    def __init__(self):
+        self._table = {}
+        self.enabled = True
+        self.lookups = 0
+        self.hits = 0
+        self.distinct = 0
+        self.saved_bytes = 0
+
+    def intern(self, value):
+        # Formula text is mostly unique per cell (relative references)
+        if not self.enabled or len(value) > StringInterner.MAX_LENGTH or value[:1] == "=":
+            return value
+        self.lookups += 1
+        existing = self._table.get(value)
+        if existing is None:
+            if len(self._table) < StringInterner.MAX_ENTRIES:
+                self._table[value] = value
+                self.distinct += 1
+            if (
+                self.lookups >= StringInterner.WARMUP_LOOKUPS
+                and self.hits < StringInterner.MIN_HIT_RATE * self.lookups
+            ):
+                # Mostly unique values: stop paying for the lookups and the
+                # table; strings already shared stay shared
+                self.enabled = False
+                self._table = {}
+            return value
+        self.hits += 1
+        if existing is not value:
+            self.saved_bytes += sys.getsizeof(value)
+        return existing
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def summary(self):
+        return (
+            f"String interning: {self.hits:,} of {self.lookups:,} lookups hit "
+            f"({self.hit_rate:.0%}), {self.distinct:,} distinct, "
+            f"~{self.saved_bytes / (1024 * 1024):.1f} MB of duplicates shared"
+            + ("" if self.enabled else "; turned off for a low hit rate")
+        )
+
+
+class TemplateCache:
+    """
+    Prepared sheet structure shared by sheets cut from the same template.
+
+    Such sheets carry identical column widths, row heights, merged ranges,
+    data validations, conditional formats and tables. The first one in a
+    target workbook copies and checks each item; later ones are matched by a
+    fingerprint of their structure records and replay the prepared objects
+    without copying them again. Entries belong to one target workbook, since
+    the copied validation and rule objects end up shared by its sheets.
+    """
+
+    MAX_ITEMS = 10_000  # larger structures are rarely repeated
+    MAX_ENTRIES = 256
+
+    def __init__(self):
+        self._entries = {}
+        self._workbook = None  # weak reference to the workbook the entries belong to
+        self.lookups = 0
+        self.hits = 0
+        self.items_reused = 0
+
+    def lookup(self, target_wb, structure):
+        """Return ``(key, prepared)`` for ``structure``; ``prepared`` is None on a miss."""
+        if self._workbook is None or self._workbook() is not target_wb:
+            self._entries.clear()
+            self._workbook = weakref.ref(target_wb)
+        if len(structure) > TemplateCache.MAX_ITEMS:
+            return None, None
+        self.lookups += 1
+        key = EnhancedSheetCopier.fingerprint(structure)
+        prepared = self._entries.get(key)
+        if prepared is not None:
+            self.hits += 1
+            self.items_reused += len(structure)
+        return key, prepared
+
+    def store(self, key, prepared):
+        if key is not None and len(self._entries) < TemplateCache.MAX_ENTRIES:
+            self._entries[key] = prepared
+
+    def summary(self):
+        return (
+            f"Template reuse: {self.hits:,} of {self.lookups:,} sheet structure(s) "
+            f"replayed from a prepared template, {self.items_reused:,} item(s) not rebuilt"
+        )
+
+
+class ResourceGuard:
+    """
+    Per-sheet resource limits taken from ``MergeSettings`` (0 disables one).
+
+    ``preflight`` counts what a loaded sheet holds before anything is
+    copied: a sheet with too many cells is skipped, one with too many merged
+    ranges or CF rules is copied values-only. While the sheet is copied,
+    ``tick`` raises ``SheetLimitExceeded`` once it has run too long or grown
+    the process by too much memory. Memory is a process-wide figure, so that
+    check is skipped while several merges share the process. ``risk`` picks,
+    from the scan manifest, the files that are only opened in a separate
+    process (``IsolatedReader``).
+    """
+
+    CHECK_EVERY = 5000  # cells between time and memory checks
+    MB = 1024 * 1024
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.cells = 0
+        self._next_check = ResourceGuard.CHECK_EVERY
+        self._started = time.monotonic()
+        self._memory_start = ResourceGuard.memory_usage() if settings.max_memory_growth_mb else None
+
+    def preflight(self, source_ws):
+        """``(action, reason)``: ``("skip", ...)``, ``("values", ...)`` or ``(None, None)``."""
+        s = self.settings
+        cells = len(source_ws._cells)
+        if s.max_sheet_cells and cells > s.max_sheet_cells and s.trim_used_range:
+            content_rows, content_cols = EnhancedSheetCopier.content_extent(source_ws)
+            cells = min(cells, content_rows * content_cols)
+        if s.max_sheet_cells and cells > s.max_sheet_cells:
+            return "skip", f"{cells:,} cells (limit {s.max_sheet_cells:,})"
+
+        merged = len(source_ws.merged_cells.ranges)
+        if s.max_merged_ranges and merged > s.max_merged_ranges:
+            return "values", f"{merged:,} merged ranges (limit {s.max_merged_ranges:,})"
+
+        try:
+            cf_rules = sum(len(rules) for rules in source_ws.conditional_formatting._cf_rules.values())
+        except Exception:
+            cf_rules = 0
+        if s.max_cf_rules and cf_rules > s.max_cf_rules:
+            return "values", f"{cf_rules:,} conditional formatting rules (limit {s.max_cf_rules:,})"
+        return None, None
+
+    def tick(self, cells):
+        self.cells += cells
+        if self.cells < self._next_check:
+            return
+        self._next_check = self.cells + ResourceGuard.CHECK_EVERY
+        s = self.settings
+
+        elapsed = time.monotonic() - self._started
+        if s.max_sheet_seconds and elapsed > s.max_sheet_seconds:
+            raise SheetLimitExceeded(
+                f"still copying after {elapsed:,.0f}s at {self.cells:,} cells "
+                f"(limit {s.max_sheet_seconds:,}s)"
+            )
+
+        # Memory is measured for the whole process, so another merge running
+        # alongside would count against this sheet; skip the check then
+        if self._memory_start is not None and ExcelMerger.running <= 1:
+            current = ResourceGuard.memory_usage()
+            if current is not None:
+                grown = (current - self._memory_start) / ResourceGuard.MB
+                if grown > s.max_memory_growth_mb:
+                    raise SheetLimitExceeded(
+                        f"memory grew by {grown:,.0f} MB at {self.cells:,} cells "
+                        f"(limit {s.max_memory_growth_mb:,} MB)"
+                    )
+
+    @staticmethod
+    def risk(file_info, settings):
+        """Why ``file_info`` should be read in a separate process, or None."""
+        manifest = file_info.manifest
+        if manifest is None:
+            return None
+        if settings.max_sheet_cells:
+            for name, (rows, cols) in manifest.dimensions.items():
+                if rows * cols > settings.max_sheet_cells:
+                    return f"'{name}' declares {rows * cols:,} cells"
+        if settings.isolate_part_mb:
+            for name, part in manifest.sheet_parts.items():
+                size = manifest.part_sizes.get(part)
+                if size and size > settings.isolate_part_mb * ResourceGuard.MB:
+                    return f"'{name}' unpacks to {size / ResourceGuard.MB:,.0f} MB"
+        return None
+
+    @staticmethod
+    def memory_usage():
+        """Resident memory of this process in bytes, or None if unknown."""
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except Exception:
+            pass
+
+        if sys.platform == "win32":
+            try:
+                import ctypes
+                from ctypes import wintypes
+
+                class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                    _fields_ = [
+                        ("cb", wintypes.DWORD),
+                        ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t),
+                        ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t),
+                        ("PeakPagefileUsage", ctypes.c_size_t),
+                    ]
+
+                counters = PROCESS_MEMORY_COUNTERS()
+                counters.cb = ctypes.sizeof(counters)
+                kernel32 = ctypes.WinDLL("kernel32")
+                kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+                kernel32.K32GetProcessMemoryInfo.argtypes = [
+                    wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD
+                ]
+                if kernel32.K32GetProcessMemoryInfo(
+                    kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+                ):
+                    return counters.WorkingSetSize
+            except Exception:
+                pass
+            return None
+
+        # Peak rather than current usage: only growth past an earlier peak shows
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == "darwin" else peak * 1024
+        except Exception:
+            return None
+
+
+class ProgressTracker:
+    """
+    Cell-weighted progress with a throughput-based ETA.
+
+    Each sheet owns a share of the bar equal to its estimated cell count and
+    advances within that share as cells are copied, so one huge sheet moves
+    the bar steadily and many tiny ones barely do.
+    """
+
+    STATUS_INTERVAL = 0.5  # seconds between status updates
+
+    def __init__(self, total_cells, progress_cb, status_cb=None, metrics_cb=None, cancel_event=None):
+        self.total = max(int(total_cells), 1)
+        self.done = 0
+        self.progress_cb = progress_cb
+        self.status_cb = status_cb
+        self.metrics_cb = metrics_cb
+        self.cancel_event = cancel_event
+        self._started = time.monotonic()
+        self._last_status = 0.0
+        self._sheet_base = 0
+        self._sheet_estimate = 0
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise MergeCancelled("Merge cancelled")
+
+    def start_sheet(self, estimated_cells):
+        self.check_cancelled()
+        self._sheet_base = self.done
+        self._sheet_estimate = max(int(estimated_cells), 1)
+
+    def sheet_progress(self, cells_done):
+        self.check_cancelled()
+        self.done = self._sheet_base + min(int(cells_done), self._sheet_estimate)
+        self._emit()
+
+    def finish_sheet(self):
+        self.done = self._sheet_base + self._sheet_estimate
+        self._emit(force=True)
+
+    def cells_per_second(self):
+        elapsed = time.monotonic() - self._started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def eta_seconds(self):
+        rate = self.cells_per_second()
+        if rate <= 0:
+            return None
+        return max(self.total - self.done, 0) / rate
+
+    def metrics(self):
+        return {
+            "cells_done": self.done,
+            "cells_total": self.total,
+            "cells_per_second": self.cells_per_second(),
+            "eta_seconds": self.eta_seconds(),
+            "elapsed_seconds": time.monotonic() - self._started,
+        }
+
+    def status_text(self):
+        percent = min(self.done / self.total, 1.0) * 100
+        eta = self.eta_seconds()
+        eta_text = ProgressTracker.format_duration(eta) if eta is not None else "--:--:--"
+        return f"{percent:.0f}% · {self.cells_per_second():,.0f} cells/s · ETA {eta_text}"
+
+    @staticmethod
+    def format_duration(seconds):
+        seconds = int(round(seconds))
+        return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+    def _emit(self, force=False):
+        # A failing UI callback must not abort the copy: _emit runs inside the
+        # record loop and from finish_sheet in a finally block.
+        try:
+            self.progress_cb(min(self.done, self.total), self.total)
+            if self.status_cb is None and self.metrics_cb is None:
+                return
+            now = time.monotonic()
+            if force or now - self._last_status >= ProgressTracker.STATUS_INTERVAL:
+                self._last_status = now
+                if self.status_cb is not None:
+                    self.status_cb(self.status_text())
+                if self.metrics_cb is not None:
+                    self.metrics_cb(self.metrics())
+        except MergeCancelled:
+            raise
+        except Exception:
+            pass
+
+
+class OutputSplitter:
+    """
+    Hands out the workbook the next sheet should go into.
+
+    Without split limits this is a single workbook saved as
+    ``settings.output_filename``. With limits, a part is closed as soon as the
+    next sheet would push it over a limit and saved on a background thread
+    while copying continues into ``<name>_002.xlsx`` and so on. At most
+    ``max_pending`` finished parts are held in memory waiting to be saved.
+    A failed save surfaces from ``check`` (called between sheets) or
+    ``finish`` and ends the merge.
+    """
+
+    def __init__(self, settings, log_cb, max_pending=2):
+        self.settings = settings
+        self.log_cb = log_cb
+        self.max_pending = max_pending
+        self.enabled = bool(
+            settings.split_max_sheets or settings.split_max_cells or settings.split_max_mb
+        )
+        self.part_number = 0
+        self.part_paths = []
+        self._pending = []  # (part number, path, future), oldest first
+        self._saved = []  # (part number, path) of finished background saves
+        self._executor = None
+        if self.enabled:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_pending, thread_name_prefix="part-save"
+            )
+        self.workbook = None
+        self._new_part()
+
+    def part_path(self, number):
+        name = pathlib.Path(self.settings.output_filename)
+        suffix = name.suffix or ".xlsx"
+        return self.settings.output_folder / f"{name.stem}_{number:03d}{suffix}"
+
+    def index_path(self):
+        name = pathlib.Path(self.settings.output_filename)
+        return self.settings.output_folder / f"{name.stem}_Index{name.suffix or '.xlsx'}"
+
+    @property
+    def current_path(self):
+        if not self.enabled:
+            return self.settings.output_folder / self.settings.output_filename
+        return self.part_path(self.part_number)
+
+    def _new_part(self):
+        self.workbook = openpyxl.Workbook()
+        # remove default sheet
+        if self.workbook.active:
+            self.workbook.remove(self.workbook.active)
+        self.part_number += 1
+        self._sheets = 0
+        self._cells = 0
+
+    def reserve(self, estimated_cells):
+        """Account for the next sheet, rolling over to a new part if needed."""
+        if self.enabled and self._sheets:
+            s = self.settings
+            over = (
+                (s.split_max_sheets and self._sheets + 1 > s.split_max_sheets)
+                or (s.split_max_cells and self._cells + estimated_cells > s.split_max_cells)
+                or (
+                    s.split_max_mb
+                    and (self._cells + estimated_cells) * MergePlan.BYTES_PER_CELL
+                    > s.split_max_mb * 1024 * 1024
+                )
+            )
+            if over:
+                self._submit_current()
+                self._new_part()
+        self._sheets += 1
+        self._cells += estimated_cells
+
+    def _submit_current(self):
+        path = self.part_path(self.part_number)
+        self.log_cb(f"Saving part {self.part_number} to {path} (in background)...")
+        # Only wait here; failures are raised by check(), outside the sheet
+        # that happens to trigger the rollover
+        while sum(1 for _, _, future in self._pending if not future.done()) >= self.max_pending:
+            concurrent.futures.wait(
+                [future for _, _, future in self._pending],
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+        self._pending.append(
+            (self.part_number, path, self._executor.submit(OutputSplitter._save, self.workbook, path))
+        )
+
+    def check(self):
+        """Collect finished background saves; raise ``PartSaveFailed`` if one failed."""
+        still_pending = []
+        failed = None
+        for number, path, future in self._pending:
+            if not future.done():
+                still_pending.append((number, path, future))
+                continue
+            error = future.exception()
+            if error is None:
+                self._saved.append((number, path))
+            elif failed is None:
+                failed = PartSaveFailed(f"Could not save part {number} to {path}: {error}")
+        self._pending = still_pending
+        self.part_paths = [path for _, path in sorted(self._saved)]
+        if failed is not None:
+            raise failed
+
+    @staticmethod
+    def _save(workbook, path):
+        workbook.save(path)
+        workbook.close()
+        return path
+
+    def finish(self):
+        """Save the last part, wait for background saves and return all paths."""
+        if not self.enabled:
+            path = self.current_path
+            self.log_cb(f"Saving to {path}...")
+            OutputSplitter._save(self.workbook, path)
+            self.part_paths.append(path)
+            return self.part_paths
+
+        try:
+            if self._sheets:
+                self._submit_current()
+            concurrent.futures.wait([future for _, _, future in self._pending])
+            self.check()
+        finally:
+            self._pending = []
+            self._executor.shutdown(wait=True)
+        return self.part_paths
+
+    def release(self, estimated_cells):
+        """Undo ``reserve`` for a sheet that was removed again."""
+        self._sheets = max(self._sheets - 1, 0)
+        self._cells = max(self._cells - estimated_cells, 0)
+
+    def abort(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class SheetCache:
+    """
+    Content-addressed on-disk cache of converted sheets.
+
+    Each entry is the ``EnhancedSheetCopier.iter_records`` stream of one
+    source sheet, keyed by the SHA-256 of the source file, the sheet name and
+    the settings that change the converted form. A small per-file manifest
+    remembers the sheet list so a fully cached file is never opened. Entries
+    are evicted least-recently-used once the folder exceeds ``max_bytes``.
+    """
+
+    FORMAT_VERSION = 4
+    CHUNK_SIZE = 2000  # records per pickled chunk
+
+    def __init__(self, cache_folder, max_bytes):
+        self.folder = pathlib.Path(cache_folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def file_digest(path):
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    @staticmethod
+    def settings_flags(settings):
+        """Settings that change the converted form of a sheet."""
+        return {
+            "version": SheetCache.FORMAT_VERSION,
+            "openpyxl": openpyxl.__version__,  # entries pickle openpyxl objects
+            "preserve_formulas": bool(settings.preserve_formulas),
+            "row_filters": [repr(f) for f in settings.row_filters],
+            "filter_header_row": settings.filter_header_row if settings.row_filters else None,
+            "trim_used_range": bool(settings.trim_used_range),
+            # A sheet is only cached after passing these, so a hit must not
+            # outlive a change to them (see ResourceGuard)
+            "limits": [
+                settings.max_sheet_cells,
+                settings.max_merged_ranges,
+                settings.max_cf_rules,
+                settings.max_sheet_seconds,
+                settings.max_memory_growth_mb,
+            ],
+        }
+
+    def _key(self, *parts):
+        raw = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def sheet_key(self, digest, sheet_name, settings):
+        return self._key(digest, sheet_name, SheetCache.settings_flags(settings))
+
+    def _manifest_path(self, digest, settings):
+        return self.folder / f"{self._key(digest, SheetCache.settings_flags(settings))}.json"
+
+    def _entry_path(self, key):
+        return self.folder / f"{key}.pkl.gz"
+
+    def get_sheet_names(self, digest, settings):
+        """Sheet list of a fully cached file, or None."""
+        path = self._manifest_path(digest, settings)
+        try:
+            sheet_names = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            return None
+        if all(self.contains(self.sheet_key(digest, s, settings)) for s in sheet_names):
+            return sheet_names
+        return None
+
+    def put_sheet_names(self, digest, settings, sheet_names):
+        path = self._manifest_path(digest, settings)
+        try:
+            path.write_text(json.dumps(list(sheet_names)), encoding="utf-8")
+        except Exception as e:
+            print(f"Warning: Could not write cache manifest: {e}")
+
+    def contains(self, key):
+        return self._entry_path(key).exists()
+
+    def load(self, key):
+        """
+        Yield the cached records for ``key``.
+
+        An entry that turns out unreadable (corrupt, or pickled by an
+        incompatible version) is deleted and ``CacheEntryUnreadable`` raised
+        after the records read so far.
+        """
+        path = self._entry_path(key)
+        try:
+            os.utime(path)  # LRU bookkeeping
+        except OSError:
+            pass
+        self.hits += 1
+        error = None
+        try:
+            with gzip.open(path, "rb") as f:
+                # peek() tells a clean end from a truncated stream, which
+                # would also end pickle.load with EOFError
+                while f.peek(1):
+                    chunk = pickle.load(f)
+                    yield from chunk
+        except Exception as e:
+            error = e
+        if error is not None:
+            self.hits -= 1
+            self.discard(key)
+            raise CacheEntryUnreadable(f"cache entry unreadable: {error}") from error
+
+    def discard(self, key):
+        try:
+            self._entry_path(key).unlink()
+        except OSError:
+            pass
+
+    def store(self, key, records):
+        """
+        Pass ``records`` through while writing them to the cache.
+
+        The entry is only committed once the stream is exhausted, so a copy
+        that fails half-way never leaves a truncated entry behind.
+        """
+        self.misses += 1
+        path = self._entry_path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        committed = False
+        try:
+            with gzip.open(tmp_path, "wb", compresslevel=1) as f:
+                chunk = []
+                for record in records:
+                    chunk.append(record)
+                    if len(chunk) >= SheetCache.CHUNK_SIZE:
+                        pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+                        chunk = []
+                    yield record
+                if chunk:
+                    pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            committed = True
+        finally:
+            if not committed:
+                try:
+                    tmp_path.unlink()
+                except OSError:
+                    pass
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits ``max_bytes``."""
+        entries = []
+        total = 0
+        for path in self.folder.glob("*.pkl.gz"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        removed = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+
+class IsolatedReader:
+    """
+    Converts a risky file in a separate process so it cannot stall or
+    exhaust the merge.
+
+    The child runs ``ExcelMerger._iter_sheet_records`` under the usual
+    per-sheet limits and writes each converted sheet to a private
+    ``SheetCache`` folder, which the merge then replays like cache hits. The
+    child is killed after ``max_file_seconds``; on POSIX its address space is
+    also capped at ``max_file_memory_mb``. A failed child skips the file.
+    """
+
+    POLL_SECONDS = 0.5
+    RESULT_FILE = "result.json"
+    DIGEST = "isolated"  # stands in for the file hash, the folder holds one file
+
+    @staticmethod
+    def read(file_info, settings, log_cb, incidents, cancel_event=None):
+        """Yield ``(sheet_name, records)`` for every sheet the child converted."""
+        import shutil
+        import tempfile
+
+        folder = pathlib.Path(tempfile.mkdtemp(prefix="excel_merger_isolated_"))
+        try:
+            process = multiprocessing.get_context("spawn").Process(
+                target=IsolatedReader._child,
+                args=(str(file_info.path), file_info.display_name, settings, str(folder)),
+                daemon=True,
+            )
+            process.start()
+            deadline = time.monotonic() + settings.max_file_seconds if settings.max_file_seconds else None
+            failure = None
+            while process.is_alive():
+                process.join(IsolatedReader.POLL_SECONDS)
+                if cancel_event is not None and cancel_event.is_set():
+                    process.kill()
+                    process.join()
+                    raise MergeCancelled("Merge cancelled")
+                if deadline is not None and time.monotonic() > deadline and process.is_alive():
+                    process.kill()
+                    process.join()
+                    failure = f"reader process still running after {settings.max_file_seconds:,}s"
+
+            result = None
+            if failure is None:
+                try:
+                    result = json.loads((folder / IsolatedReader.RESULT_FILE).read_text(encoding="utf-8"))
+                except Exception:
+                    failure = f"reader process exited with code {process.exitcode}"
+            if failure is not None:
+                ExcelMerger._limit_incident(incidents, log_cb, file_info, None, "skipped", failure)
+                return
+
+            for message in result["log"]:
+                log_cb(message)
+            incidents.extend(result["incidents"])
+            if result.get("error"):
+                # Sheets converted before the failure are still merged
+                ExcelMerger._limit_incident(
+                    incidents, log_cb, file_info, None, "not fully read",
+                    f"reader process failed: {result['error']}",
+                )
+
+            cache = SheetCache(folder, 0)
+            for sheet_name in result["sheets"]:
+                yield sheet_name, cache.load(cache.sheet_key(IsolatedReader.DIGEST, sheet_name, settings))
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    @staticmethod
+    def _child(path, display_name, settings, folder):
+        if settings.max_file_memory_mb:
+            try:
+                import resource
+                limit = settings.max_file_memory_mb * ResourceGuard.MB
+                resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+            except Exception:
+                pass  # no address space limit on Windows
+
+        result = {"sheets": [], "log": [], "incidents": []}
+        cache = SheetCache(folder, 0)
+        file_info = ExcelFileInfo(path, display_name)
+        try:
+            for sheet_name, records in ExcelMerger._iter_sheet_records(
+                file_info, settings, None, result["log"].append, result["incidents"], isolate=False
+            ):
+                try:
+                    for _ in cache.store(cache.sheet_key(IsolatedReader.DIGEST, sheet_name, settings), records):
+                        pass
+                    result["sheets"].append(sheet_name)
+                except SheetLimitExceeded as e:
+                    ExcelMerger._limit_incident(
+                        result["incidents"], result["log"].append, file_info, sheet_name, "skipped", str(e)
+                    )
+        except MemoryError:
+            result["error"] = f"out of memory (limit {settings.max_file_memory_mb:,} MB)"
+        except Exception as e:
+            result["error"] = str(e) or type(e).__name__
+
+        tmp_path = pathlib.Path(folder) / (IsolatedReader.RESULT_FILE + ".tmp")
+        tmp_path.write_text(json.dumps(result), encoding="utf-8")
+        os.replace(tmp_path, pathlib.Path(folder) / IsolatedReader.RESULT_FILE)
+
+
+class OutputVerifier:
+    """
+    Streams the merged output and its sources and compares each copied sheet.
+
+    Every sheet is reduced to a count of non-empty cells plus a BLAKE2 checksum
+    over ``(row, column, value)``. Workbooks are opened read-only and walked
+    once, so memory stays bounded; output parts and source files are digested
+    concurrently. On the source side the expected result of a filtered merge
+    is worked out here rather than by the copier's code: filter columns are
+    looked up in the header row and formula references re-pointed at the
+    kept rows, so a mistake in either is caught instead of replayed.
+    """
+
+    MAX_WORKERS = 4
+
+    class Mismatch:
+        def __init__(self, source_path, source_sheet, output_path, output_sheet, reason):
+            self.source_path = source_path
+            self.source_sheet = source_sheet
+            self.output_path = output_path
+            self.output_sheet = output_sheet
+            self.reason = reason
+
+        def __str__(self):
+            return (
+                f"{pathlib.Path(self.source_path).name} :: '{self.source_sheet}' -> "
+                f"{pathlib.Path(self.output_path).name} :: '{self.output_sheet}': {self.reason}"
+            )
+
+    @staticmethod
+    def _normalize(value):
+        if isinstance(value, (ArrayFormula, DataTableFormula)):
+            # Their repr is the default one, carrying the object's address
+            return f"{type(value).__name__}:{sorted(dict(value).items())!r}:{getattr(value, 'text', None)!r}"
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return f"{type(value).__name__}:{value!r}"
+
+    @staticmethod
+    def _filter_columns(row_filters, header_values):
+        """``[(column index, filter), ...]`` for a header row, or None if a column is missing."""
+        headers = {}
+        for idx, header in enumerate(header_values, start=1):
+            if header is not None:
+                headers.setdefault(str(header).strip().lower(), idx)
+        columns = []
+        for row_filter in row_filters:
+            name = str(row_filter.column).strip().lower()
+            if name.startswith("col:"):
+                try:
+                    idx = column_index_from_string(name[4:].strip().upper())
+                except ValueError:
+                    return None
+            else:
+                idx = headers.get(name)
+                if idx is None:
+                    return None
+            columns.append((idx, row_filter))
+        return columns
+
+    REFERENCE_RE = re.compile(r"(\$?[A-Za-z]{0,3}\$?)(\d+)")
+
+    @staticmethod
+    def _expected_formula(formula, kept, position, last_row):
+        """
+        ``formula`` with its same-sheet references moved to the output rows.
+
+        ``kept`` lists the kept source rows in order, ``position`` maps each
+        to its output row and ``last_row`` is the last source row read.
+        """
+        from openpyxl.formula.tokenizer import Tokenizer, Token
+
+        def new_row(row):
+            if row > last_row:
+                return len(kept) + row - last_row
+            return position.get(row)
+
+        def move(ref):
+            if "!" in ref:
+                return ref  # other sheets keep their rows
+            ends = ref.split(":")
+            found = [OutputVerifier.REFERENCE_RE.fullmatch(end) for end in ends]
+            if len(ends) > 2 or not all(found):
+                return ref  # names, whole columns, structured references
+            rows = [int(m.group(2)) for m in found]
+            if len(ends) == 1:
+                row = new_row(rows[0])
+                return "#REF!" if row is None else f"{found[0].group(1)}{row}"
+
+            low, high = min(rows), max(rows)
+            lo = bisect.bisect_left(kept, low)
+            hi = bisect.bisect_right(kept, high)
+            first = lo + 1 if lo < hi else None
+            last = hi if lo < hi else None
+            if high > last_row:
+                if first is None:
+                    first = new_row(max(low, last_row + 1))
+                last = new_row(high)
+            if first is None:
+                return "#REF!"
+            if rows[0] > rows[1]:
+                first, last = last, first
+            return f"{found[0].group(1)}{first}:{found[1].group(1)}{last}"
+
+        try:
+            tokens = Tokenizer(formula).items
+        except Exception:
+            return formula
+        return "=" + "".join(
+            move(t.value) if t.type == Token.OPERAND and t.subtype == Token.RANGE else t.value
+            for t in tokens
+        )
+
+    @staticmethod
+    def _digest_rows(rows, row_filters=None, header_row=1, preserve_formulas=True):
+        """
+        ``(cell_count, checksum)`` of a stream of row value tuples.
+
+        Formulas go into their own digest. While rows may be filtered out
+        they are held back until every kept row is known; otherwise they are
+        digested as they are read.
+        """
+        h = hashlib.blake2b(digest_size=16)
+        formula_hash = hashlib.blake2b(digest_size=16)
+
+        def add_formula(row, col_idx, text):
+            formula_hash.update(f"{row}\x1f{col_idx}\x1f{OutputVerifier._normalize(text)}\x1e".encode("utf-8"))
+
+        count = kept_count = 0
+        columns = None
+        kept = []  # source rows kept, only recorded while filtering
+        formulas = []  # (source row, column, text) held back on kept rows
+        old_row = 0
+        for old_row, values in enumerate(rows, start=1):
+            if row_filters and old_row == header_row:
+                columns = OutputVerifier._filter_columns(row_filters, values)
+                if not columns:
+                    # Nothing gets filtered: rows and formulas stay as they are
+                    for formula in formulas:
+                        add_formula(*formula)
+                    formulas = []
+            hold_formulas = bool(row_filters) and (old_row < header_row or bool(columns))
+            if columns and old_row > header_row and not all(
+                row_filter.matches(values[idx - 1] if idx <= len(values) else None)
+                for idx, row_filter in columns
+            ):
+                continue
+            kept_count += 1
+            if row_filters:
+                kept.append(old_row)
+            for col_idx, value in enumerate(values, start=1):
+                if value is None or value == "":
+                    continue
+                count += 1
+                if preserve_formulas and isinstance(value, str) and value.startswith("="):
+                    if hold_formulas:
+                        formulas.append((old_row, col_idx, value))
+                    else:
+                        add_formula(old_row, col_idx, value)
+                    continue
+                h.update(f"{kept_count}\x1f{col_idx}\x1f{OutputVerifier._normalize(value)}\x1e".encode("utf-8"))
+
+        filtered = kept_count != old_row
+        position = {row: i + 1 for i, row in enumerate(kept)} if filtered else None
+        for row, col_idx, text in formulas:
+            if filtered:
+                text = OutputVerifier._expected_formula(text, kept, position, old_row)
+                row = position[row]
+            add_formula(row, col_idx, text)
+        return count, h.hexdigest() + formula_hash.hexdigest()
+
+    @staticmethod
+    def _digest_workbook(path, sheet_names, data_only, row_filters=None, header_row=1, preserve_formulas=True):
+        """Digest the requested sheets of one workbook in a single read-only pass."""
+        results = {}
+        wb = load_workbook(path, read_only=True, data_only=data_only, keep_links=False)
+        try:
+            for sheet_name in sheet_names:
+                try:
+                    ws = wb[sheet_name]
+                    results[sheet_name] = OutputVerifier._digest_rows(
+                        ws.iter_rows(values_only=True), row_filters, header_row, preserve_formulas
+                    )
+                except Exception as e:
+                    results[sheet_name] = e
+        finally:
+            wb.close()
+        return results
+
+    @staticmethod
+    def verify(pairs, settings, log_cb):
+        """
+        Compare ``pairs`` of ``(source_path, source_sheet, output_path, output_sheet)``.
+
+        Returns the list of ``OutputVerifier.Mismatch`` found (empty when all match).
+        """
+        started = time.monotonic()
+        sources = {}
+        outputs = {}
+        for source_path, source_sheet, output_path, output_sheet in pairs:
+            sources.setdefault(pathlib.Path(source_path), set()).add(source_sheet)
+            outputs.setdefault(pathlib.Path(output_path), set()).add(output_sheet)
+
+        log_cb(f"Verifying {len(pairs)} sheet(s) against {len(sources)} source file(s)...")
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=OutputVerifier.MAX_WORKERS, thread_name_prefix="verify"
+        ) as pool:
+            output_jobs = {
+                path: pool.submit(OutputVerifier._digest_workbook, path, sorted(names), False)
+                for path, names in outputs.items()
+            }
+            source_jobs = {
+                path: pool.submit(
+                    OutputVerifier._digest_workbook,
+                    path,
+                    sorted(names),
+                    not settings.preserve_formulas,
+                    settings.row_filters,
+                    settings.filter_header_row,
+                    settings.preserve_formulas,
+                )
+                for path, names in sources.items()
+            }
+
+            mismatches = []
+            for source_path, source_sheet, output_path, output_sheet in pairs:
+                def fail(reason):
+                    mismatches.append(OutputVerifier.Mismatch(
+                        source_path, source_sheet, output_path, output_sheet, reason
+                    ))
+
+                try:
+                    expected = source_jobs[pathlib.Path(source_path)].result().get(source_sheet)
+                    actual = output_jobs[pathlib.Path(output_path)].result().get(output_sheet)
+                except Exception as e:
+                    fail(f"could not read workbook: {e}")
+                    continue
+                if isinstance(expected, Exception) or expected is None:
+                    fail(f"could not read source sheet: {expected}")
+                elif isinstance(actual, Exception) or actual is None:
+                    fail(f"could not read output sheet: {actual}")
+                elif expected[0] != actual[0]:
+                    fail(f"cell count {actual[0]:,} != expected {expected[0]:,}")
+                elif expected[1] != actual[1]:
+                    fail("cell values differ (checksum mismatch)")
+
+        elapsed = time.monotonic() - started
+        if mismatches:
+            log_cb(f"✗ Verification found {len(mismatches)} mismatched sheet(s) ({elapsed:.1f}s):")
+            for mismatch in mismatches:
+                log_cb(f"  ✗ {mismatch}")
+        else:
+            log_cb(f"✓ Verification passed: {len(pairs)} sheet(s) match ({elapsed:.1f}s)")
+        return mismatches
+
+
+class ExcelMerger:
+    """Orchestrator for the merge process (openpyxl-only)."""
+
+    # Merges in progress in this process (several can run through
+    # AsyncExcelMerger); ResourceGuard only checks memory while it is 1
+    running = 0
+    _running_lock = threading.Lock()
+
+    @staticmethod
+    def _build_sheet_name(file_index: int, sheet_name: str, existing_names) -> str:
+        """Build a collision-safe sheet name with index prefix within 31-char limit."""
+        safe_sheet = (
+            sheet_name
+            .replace(":", "_")
+            .replace("/", "_")
+            .replace("\\", "_")
+            .replace("?", "_")
+            .replace("*", "_")
+            .replace("[", "_")
+            .replace("]", "_")
+        )
+        base = f"{file_index}_{safe_sheet}"
+        if len(base) > 31:
+            prefix = f"{file_index}_"
+            remaining = max(31 - len(prefix), 1)
+            base = prefix + safe_sheet[:remaining]
 
         name = base
         suffix = 1
@@ -438,492 +2407,1117 @@ class ExcelMerger:
         return name
 
     @staticmethod
-    def merge(files, settings, log_cb, progress_cb):
+    def _iter_sheet_records(file_info, settings, cache, log_cb, incidents=None,
+                            cancel_event=None, isolate=True, only=None):
+        """
+        Yield ``(sheet_name, records)`` for every sheet of ``file_info``.
+
+        With a cache, hits are replayed from disk and misses are recorded as
+        they are copied. A file whose sheets are all cached is never opened.
+        Sheets over a ``ResourceGuard`` limit are skipped or copied
+        values-only (and not cached), and risky files are read through
+        ``IsolatedReader``; both are logged and appended to ``incidents``.
+        ``only`` restricts the walk to one sheet name.
+        """
+        if incidents is None:
+            incidents = []
+        digest = None
+        if cache is not None:
+            try:
+                manifest = file_info.manifest
+                if manifest is not None and manifest.digest and manifest.is_current():
+                    digest = manifest.digest
+                else:
+                    digest = SheetCache.file_digest(file_info.path)
+                    if manifest is not None and manifest.is_current():
+                        manifest.digest = digest
+            except Exception as e:
+                log_cb(f"  Warning: Could not hash {file_info.display_name}, cache skipped: {e}")
+
+        def replay(sheet_name, key):
+            return ExcelMerger._replay_cached(
+                cache, key, sheet_name, file_info, settings, log_cb, incidents, cancel_event, isolate
+            )
+
+        if digest is not None and only is None:
+            cached_names = cache.get_sheet_names(digest, settings)
+            if cached_names is not None:
+                log_cb("  (all sheets served from cache)")
+                for sheet_name in cached_names:
+                    yield sheet_name, replay(sheet_name, cache.sheet_key(digest, sheet_name, settings))
+                return
+
+        if isolate and settings.isolate_risky_files:
+            reason = ResourceGuard.risk(file_info, settings)
+            if reason is not None:
+                log_cb(f"  Reading in a separate process: {reason}")
+                for sheet_name, records in IsolatedReader.read(
+                    file_info, settings, log_cb, incidents, cancel_event
+                ):
+                    if only is None or sheet_name == only:
+                        yield sheet_name, records
+                return
+
+        source_wb = load_workbook(
+            file_info.path,
+            data_only=not settings.preserve_formulas,
+            keep_links=False,
+            keep_vba=False,
+        )
+        # The scan-time sheet list (the one the plan was built from) drives
+        # the loop while the file is unchanged
+        manifest = file_info.manifest
+        if manifest is not None and manifest.is_current():
+            sheet_names = [n for n in manifest.sheet_names if n in source_wb.sheetnames]
+        else:
+            sheet_names = source_wb.sheetnames
+        if only is not None:
+            sheet_names = [n for n in sheet_names if n == only]
+        copied_names = []
+        try:
+            for sheet_name in sheet_names:
+                # One unreadable sheet must not end the generator and with it
+                # the rest of the file
+                try:
+                    source_ws = source_wb[sheet_name]
+                    if not isinstance(source_ws, Worksheet):
+                        log_cb(f"  Skipping '{sheet_name}': {type(source_ws).__name__} has no cells to copy")
+                        continue
+                    copied_names.append(sheet_name)
+
+                    key = cache.sheet_key(digest, sheet_name, settings) if digest is not None else None
+                    if key is not None and cache.contains(key):
+                        yield sheet_name, replay(sheet_name, key)
+                        continue
+
+                    guard = ResourceGuard(settings)
+                    action, reason = guard.preflight(source_ws)
+                except Exception as e:
+                    log_cb(f"ERROR reading sheet '{sheet_name}': {e}")
+                    continue
+                if action == "skip":
+                    ExcelMerger._limit_incident(incidents, log_cb, file_info, sheet_name, "skipped", reason)
+                    continue
+                if action == "values":
+                    ExcelMerger._limit_incident(
+                        incidents, log_cb, file_info, sheet_name, "copied values-only", reason
+                    )
+
+                records = EnhancedSheetCopier.iter_records(
+                    source_ws,
+                    settings.preserve_formulas,
+                    settings.row_filters,
+                    settings.filter_header_row,
+                    settings.trim_used_range,
+                    values_only=action == "values",
+                    guard=guard,
+                )
+                if key is None or action == "values":
+                    yield sheet_name, records
+                else:
+                    yield sheet_name, cache.store(key, records)
+
+            if digest is not None and only is None:
+                cache.put_sheet_names(digest, settings, copied_names)
+        finally:
+            try:
+                source_wb.close()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _replay_cached(cache, key, sheet_name, file_info, settings, log_cb, incidents,
+                       cancel_event=None, isolate=True):
+        """
+        Yield a cached sheet, converting it again if its entry is unreadable.
+
+        The conversion yields the same records the entry held (same file,
+        same settings), so the ones already replayed are skipped and the
+        sheet continues where the entry broke off.
+        """
+        replayed = 0
+        try:
+            for record in cache.load(key):
+                replayed += 1
+                yield record
+            return
+        except CacheEntryUnreadable as e:
+            log_cb(f"  '{sheet_name}': {e}; converting it again")
+
+        converted = False
+        for _, records in ExcelMerger._iter_sheet_records(
+            file_info, settings, cache, log_cb, incidents, cancel_event, isolate, only=sheet_name
+        ):
+            converted = True
+            for idx, record in enumerate(records):
+                if idx >= replayed:
+                    yield record
+        if not converted:
+            raise CacheEntryUnreadable(f"'{sheet_name}' could not be converted again")
+
+    @staticmethod
+    def _limit_incident(incidents, log_cb, file_info, sheet_name, action, reason):
+        """Log a resource-limit incident and add it to ``incidents``."""
+        if sheet_name is None:
+            log_cb(f"  ! {file_info.display_name} {action}: {reason}")
+            incidents.append(f"{file_info.display_name} {action}: {reason}")
+        else:
+            log_cb(f"  ! '{sheet_name}' {action}: {reason}")
+            incidents.append(f"{file_info.display_name} :: '{sheet_name}' {action}: {reason}")
+
+    @staticmethod
+    def plan(files_to_process):
+        """Build a ``MergePlan`` from the scan results without opening any file."""
+        plan = MergePlan()
+        planned_names = []
+        for file_idx, file_info in enumerate(files_to_process, start=1):
+            unsized = [s for s in file_info.sheet_names if s not in file_info.sheet_dimensions]
+            unsized_cells = 1
+            try:
+                file_size = file_info.path.stat().st_size
+            except OSError:
+                file_size = 0
+            # A sheet declaring A1:XFD1048576 with a few KB of data would
+            # otherwise own the whole bar; no sheet holds more cells than its
+            # file could encode.
+            sized_cap = min(max(file_size * MergePlan.MAX_CELLS_PER_BYTE, 1), MergePlan.MAX_SHEET_CELLS)
+            if unsized:
+                unsized_cells = max(file_size // MergePlan.BYTES_PER_CELL // len(unsized), 1)
+
+            for sheet_name in file_info.sheet_names:
+                dims = file_info.sheet_dimensions.get(sheet_name)
+                estimated = min(dims[0] * dims[1], sized_cap) if dims else unsized_cells
+                output_name = ExcelMerger._build_sheet_name(file_idx, sheet_name, planned_names)
+                planned_names.append(output_name)
+                plan.add(PlannedSheet(file_idx, file_info, sheet_name, output_name, max(estimated, 1)))
+        return plan
+
+    @staticmethod
+    def _log_notices(sheet_name, sheet_stats, log_cb):
+        for notice in sheet_stats.get("notices", ()):
+            log_cb(f"    '{sheet_name}': {notice}")
+
+    @staticmethod
+    def _log_used_range(sheet_name, sheet_stats, log_cb):
+        if not sheet_stats.get("bloated"):
+            return
+        declared = sheet_stats.get("declared_range")
+        content = sheet_stats.get("content_range") or "nothing"
+        if sheet_stats.get("trimmed"):
+            log_cb(f"    Used range of '{sheet_name}' is {declared} but content ends at {content}; trimmed")
+        else:
+            log_cb(
+                f"    Used range of '{sheet_name}' is {declared} but content ends at {content}; "
+                "enable 'Trim Empty Formatting' to skip the empty cells"
+            )
+
+    @staticmethod
+    def _log_plan(plan, log_cb):
+        log_cb("Dry run: no files will be copied or written.")
+        for planned in plan.sheets:
+            log_cb(
+                f"  [{planned.file_index}] {planned.file_info.display_name} :: "
+                f"'{planned.sheet_name}' -> '{planned.output_name}' (~{planned.estimated_cells:,} cells)"
+            )
+        log_cb(
+            f"Planned {len(plan.sheets)} output sheet(s), ~{plan.total_cells:,} cells, "
+            f"estimated time {ProgressTracker.format_duration(plan.estimate_seconds())}"
+        )
+
+    @staticmethod
+    def _write_index_sheet(index_ws, mapping_data, link_for, log_cb):
+        """Fill ``index_ws`` with one row per copied sheet; ``link_for(row)`` gives the hyperlink."""
+        try:
+            log_cb("Generating Index sheet...")
+            index_ws.title = "Index"
+            headers = list(mapping_data[0].keys())
+            last_col = get_column_letter(len(headers))
+
+            title_cell = index_ws.cell(row=1, column=1, value="Merged Workbook Index")
+            title_cell.font = openpyxl.styles.Font(bold=True, size=14)
+            index_ws.merge_cells(f"A1:{last_col}1")
+
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            index_ws.cell(row=2, column=1, value=f"Generated on: {timestamp}")
+
+            header_fill = openpyxl.styles.PatternFill(
+                start_color="C6EFCE", end_color="C6EFCE", fill_type="solid"
+            )
+            for col_idx, header in enumerate(headers, start=1):
+                cell = index_ws.cell(row=4, column=col_idx, value=header)
+                cell.font = openpyxl.styles.Font(bold=True)
+                cell.fill = header_fill
+
+            link_col = headers.index("New Sheet") + 1
+            for row_idx, row_data in enumerate(mapping_data, start=5):
+                for col_idx, header in enumerate(headers, start=1):
+                    index_ws.cell(row=row_idx, column=col_idx, value=row_data.get(header, ""))
+
+                # simple hyperlinks to sheets
+                if row_data.get("New Sheet"):
+                    cell = index_ws.cell(row=row_idx, column=link_col)
+                    cell.hyperlink = link_for(row_data)
+                    cell.font = openpyxl.styles.Font(color="0563C1", underline="single")
+
+            # Auto column widths
+            try:
+                for col_idx in range(1, len(headers) + 1):
+                    max_length = 0
+                    for row_idx in range(1, 5 + len(mapping_data)):
+                        try:
+                            cell_value = index_ws.cell(row=row_idx, column=col_idx).value
+                            if cell_value is not None:
+                                max_length = max(max_length, len(str(cell_value)))
+                        except Exception:
+                            pass
+
+                    column_letter = get_column_letter(col_idx)
+                    index_ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
+            except Exception as e:
+                log_cb(f"Warning: Could not auto-size columns: {e}")
+
+            index_ws.freeze_panes = "A5"
+        except Exception as e:
+            log_cb(f"ERROR creating index sheet: {e}")
+            import traceback
+            log_cb(f"Traceback: {traceback.format_exc()}")
+
+    @staticmethod
+    def merge(files, settings, log_cb, progress_cb, status_cb=None, cancel_event=None, metrics_cb=None):
+        """
+        Merge the selected ``files`` and return the output path.
+
+        Setting the optional ``threading.Event`` ``cancel_event`` stops the
+        merge at the next sheet or progress tick with ``MergeCancelled``.
+        """
+        splitter = None
+        with ExcelMerger._running_lock:
+            ExcelMerger.running += 1
         try:
             files_to_process = [f for f in files if f.selected]
             if not files_to_process:
                 raise ValueError("No files selected for merging.")
 
-            total_sheets = sum(f.sheet_count for f in files_to_process)
-            current_sheet_count = 0
+            plan = ExcelMerger.plan(files_to_process)
+            if settings.dry_run:
+                ExcelMerger._log_plan(plan, log_cb)
+                return None
 
-            target_wb = openpyxl.Workbook()
-            # remove default sheet
-            if target_wb.active:
-                target_wb.remove(target_wb.active)
+            tracker = ProgressTracker(
+                plan.total_cells, progress_cb, status_cb, metrics_cb, cancel_event
+            )
+            splitter = OutputSplitter(settings, log_cb)
+            used_names = []
+            rows_read_total = rows_kept_total = 0
+            verify_pairs = []  # (source path, source sheet, part number, output sheet)
+            shared_sheets = {}  # content fingerprint -> (output sheet, part number)
+            interner = StringInterner() if settings.intern_strings else None
+            templates = TemplateCache() if settings.reuse_templates else None
+            incidents = []  # resource-limit incidents, see ResourceGuard
+            dedupe_count = 0
+
+            def add_mapping(file_idx, file_info, sheet_name, sheet_stats,
+                            new_sheet_name, part_number, shared=False):
+                nonlocal rows_read_total, rows_kept_total, dedupe_count
+                ExcelMerger._log_notices(sheet_name, sheet_stats, log_cb)
+                if shared:
+                    dedupe_count += 1
+                    log_cb(f"  = '{sheet_name}' is identical to '{new_sheet_name}', not copied again")
+
+                row_data = {
+                    "File Index": file_idx,
+                    "File Name": file_info.display_name,
+                    "Original Sheet": sheet_name,
+                    "New Sheet": new_sheet_name,
+                }
+                verify_pairs.append((file_info.path, sheet_name, part_number, new_sheet_name))
+                if splitter.enabled:
+                    row_data["Output File"] = splitter.part_path(part_number).name
+                if settings.dedupe_sheets:
+                    row_data["Shared"] = "Yes" if shared else ""
+                if settings.row_filters:
+                    row_data["Rows Read"] = sheet_stats.get("rows_read", "")
+                    row_data["Rows Kept"] = sheet_stats.get("rows_kept", "")
+                    rows_read_total += sheet_stats.get("rows_read", 0)
+                    rows_kept_total += sheet_stats.get("rows_kept", 0)
+                mapping_data.append(row_data)
 
             mapping_data = []
 
             log_cb("Initializing merge process (openpyxl)...")
             log_cb(f"Preserving formulas: {settings.preserve_formulas}")
+            if settings.row_filters:
+                log_cb("Row filters: " + "; ".join(repr(f) for f in settings.row_filters))
 
-            for file_idx, file_info in enumerate(files_to_process, start=1):
-                log_cb(f"Processing File {file_idx}/{len(files_to_process)}: {file_info.display_name}")
-
+            cache = None
+            if settings.use_sheet_cache:
                 try:
-                    source_wb = load_workbook(
-                        file_info.path,
-                        data_only=not settings.preserve_formulas,
-                        keep_links=False,
-                        keep_vba=False,
-                    )
+                    cache = SheetCache(settings.cache_folder, settings.cache_max_mb * 1024 * 1024)
+                    log_cb(f"Using sheet cache: {cache.folder}")
                 except Exception as e:
-                    log_cb(f"ERROR opening file {file_info.display_name}: {e}")
-                    continue
+                    log_cb(f"Warning: Sheet cache disabled: {e}")
+
+            for file_idx, file_info in enumerate(files_to_process, start=1):
+                log_cb(f"Processing File {file_idx}/{len(files_to_process)}: {file_info.display_name}")
 
                 try:
-                    for sheet_name in source_wb.sheetnames:
+                    FolderScanner.refresh_if_changed(file_info, log_cb)
+                    for sheet_name, records in ExcelMerger._iter_sheet_records(
+                        file_info, settings, cache, log_cb, incidents, cancel_event
+                    ):
+                        splitter.check()
+                        estimated_cells = plan.estimated_cells(file_idx, sheet_name)
+                        tracker.start_sheet(estimated_cells)
+                        reserved = False
                         try:
-                            source_ws = source_wb[sheet_name]
+                            fingerprint = hasher = None
+                            if settings.dedupe_sheets:
+                                if estimated_cells <= settings.dedupe_max_cells:
+                                    records = list(records)
+                                    fingerprint = EnhancedSheetCopier.fingerprint(records)
+                                    if fingerprint in shared_sheets:
+                                        sheet_stats = next(
+                                            (r[1] for r in reversed(records) if r[0] == "stats"), {}
+                                        )
+                                        add_mapping(file_idx, file_info, sheet_name, sheet_stats,
+                                                    *shared_sheets[fingerprint], shared=True)
+                                        continue
+                                else:
+                                    hasher = hashlib.blake2b(digest_size=16)
+                                    records = EnhancedSheetCopier.hash_records(records, hasher)
+
+                            splitter.reserve(estimated_cells)
+                            reserved = True
+                            target_wb = splitter.workbook
 
                             new_sheet_name = ExcelMerger._build_sheet_name(
-                                file_idx, sheet_name, target_wb.sheetnames
+                                file_idx, sheet_name, used_names
                             )
                             log_cb(f"  > Copying '{sheet_name}' -> '{new_sheet_name}'")
 
-                            EnhancedSheetCopier.copy_sheet(
-                                source_ws,
+                            sheet_stats = {}
+                            target_ws = EnhancedSheetCopier.apply_records(
+                                records,
                                 target_wb,
                                 new_sheet_name,
-                                preserve_formulas=settings.preserve_formulas,
+                                progress_cb=tracker.sheet_progress,
+                                stats=sheet_stats,
+                                interner=interner,
+                                templates=templates,
                             )
-
-                            mapping_data.append(
-                                {
-                                    "File Index": file_idx,
-                                    "File Name": file_info.display_name,
-                                    "Original Sheet": sheet_name,
-                                    "New Sheet": new_sheet_name,
-                                }
+                            new_sheet_name = target_ws.title
+                            ExcelMerger._log_used_range(sheet_name, sheet_stats, log_cb)
+
+                            if hasher is not None:
+                                fingerprint = hasher.hexdigest()
+                                if fingerprint in shared_sheets:
+                                    target_wb.remove(target_ws)
+                                    splitter.release(estimated_cells)
+                                    add_mapping(file_idx, file_info, sheet_name, sheet_stats,
+                                                *shared_sheets[fingerprint], shared=True)
+                                    continue
+
+                            used_names.append(new_sheet_name)
+                            if fingerprint is not None:
+                                shared_sheets[fingerprint] = (new_sheet_name, splitter.part_number)
+                            add_mapping(file_idx, file_info, sheet_name, sheet_stats,
+                                        new_sheet_name, splitter.part_number)
+                        except MergeCancelled:
+                            raise
+                        except SheetLimitExceeded as e:
+                            if reserved:
+                                splitter.release(estimated_cells)
+                            ExcelMerger._limit_incident(
+                                incidents, log_cb, file_info, sheet_name, "skipped", str(e)
                             )
-
-                            current_sheet_count += 1
-                            progress_cb(current_sheet_count, total_sheets)
+                            continue
+                        except CacheEntryUnreadable as e:
+                            if reserved:
+                                splitter.release(estimated_cells)
+                            log_cb(f"ERROR copying sheet '{sheet_name}': {e}")
+                            continue
                         except Exception as e:
                             log_cb(f"ERROR copying sheet '{sheet_name}': {e}")
                             import traceback
                             log_cb(f"Traceback: {traceback.format_exc()}")
                             continue
+                        finally:
+                            tracker.finish_sheet()
+                except (MergeCancelled, PartSaveFailed):
+                    raise
+                except Exception as e:
+                    log_cb(f"ERROR opening file {file_info.display_name}: {e}")
+                    continue
 
-                finally:
-                    try:
-                        source_wb.close()
-                    except Exception:
-                        pass
-
-            # ---- Index sheet ----
-            if settings.create_index_sheet and mapping_data:
-                try:
-                    log_cb("Generating Index sheet...")
-                    index_ws = target_wb.create_sheet("Index", 0)
+                log_cb(f"  Progress: {tracker.status_text()}")
 
-                    title_cell = index_ws.cell(row=1, column=1, value="Merged Workbook Index")
-                    title_cell.font = openpyxl.styles.Font(bold=True, size=14)
-                    index_ws.merge_cells("A1:D1")
+            tracker.check_cancelled()
 
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    index_ws.cell(row=2, column=1, value=f"Generated on: {timestamp}")
+            if not used_names:
+                # openpyxl cannot save a workbook without sheets
+                splitter.abort()
+                if incidents:
+                    log_cb(f"Resource limits: {len(incidents)} incident(s)")
+                    for incident in incidents:
+                        log_cb(f"  ! {incident}")
+                raise ValueError(
+                    "No sheets were copied, so there is nothing to save"
+                    + (f" ({len(incidents)} resource-limit incident(s), see above)" if incidents else "")
+                )
 
-                    headers = ["File Index", "File Name", "Original Sheet", "New Sheet"]
-                    header_fill = openpyxl.styles.PatternFill(
-                        start_color="C6EFCE", end_color="C6EFCE", fill_type="solid"
-                    )
-                    for col_idx, header in enumerate(headers, start=1):
-                        cell = index_ws.cell(row=4, column=col_idx, value=header)
-                        cell.font = openpyxl.styles.Font(bold=True)
-                        cell.fill = header_fill
-
-                    for row_idx, row_data in enumerate(mapping_data, start=5):
-                        index_ws.cell(row=row_idx, column=1, value=row_data.get("File Index", ""))
-                        index_ws.cell(row=row_idx, column=2, value=row_data.get("File Name", ""))
-                        index_ws.cell(row=row_idx, column=3, value=row_data.get("Original Sheet", ""))
-                        index_ws.cell(row=row_idx, column=4, value=row_data.get("New Sheet", ""))
-
-                    # simple hyperlinks to sheets
-                    for row_idx in range(5, 5 + len(mapping_data)):
-                        sheet_name = index_ws.cell(row=row_idx, column=4).value
-                        if sheet_name and sheet_name in target_wb.sheetnames:
-                            cell = index_ws.cell(row=row_idx, column=4)
-                            cell.hyperlink = f"#'{sheet_name}'!A1"
-                            cell.font = openpyxl.styles.Font(color="0563C1", underline="single")
-
-                    # Auto column widths
-                    try:
-                        for col_idx in range(1, 5):  # Columns A-D
-                            max_length = 0
-                            for row_idx in range(1, 5 + len(mapping_data)):
-                                try:
-                                    cell_value = index_ws.cell(row=row_idx, column=col_idx).value
-                                    if cell_value is not None:
-                                        max_length = max(max_length, len(str(cell_value)))
-                                except Exception:
-                                    pass
-                            
-                            column_letter = get_column_letter(col_idx)
-                            index_ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
-                    except Exception as e:
-                        log_cb(f"Warning: Could not auto-size columns: {e}")
+            # ---- Index sheet ----
+            index_path = None
+            if settings.create_index_sheet and mapping_data and not splitter.enabled:
+                ExcelMerger._write_index_sheet(
+                    splitter.workbook.create_sheet("Index", 0),
+                    mapping_data,
+                    lambda row: f"#'{row['New Sheet']}'!A1",
+                    log_cb,
+                )
 
-                    index_ws.freeze_panes = "A5"
-                except Exception as e:
-                    log_cb(f"ERROR creating index sheet: {e}")
-                    import traceback
-                    log_cb(f"Traceback: {traceback.format_exc()}")
+            try:
+                part_paths = splitter.finish()
+            except Exception:
+                splitter.abort()
+                raise
+            output_full_path = part_paths[0] if part_paths else splitter.current_path
+
+            if settings.create_index_sheet and mapping_data and splitter.enabled:
+                # Master index in its own workbook, linking into each part
+                index_wb = openpyxl.Workbook()
+                ExcelMerger._write_index_sheet(
+                    index_wb.active,
+                    mapping_data,
+                    lambda row: f"{row['Output File']}#'{row['New Sheet']}'!A1",
+                    log_cb,
+                )
+                index_path = splitter.index_path()
+                log_cb(f"Saving index to {index_path}...")
+                index_wb.save(index_path)
+                index_wb.close()
+                output_full_path = index_path
+
+            if cache is not None:
+                removed = cache.evict()
+                log_cb(
+                    f"Sheet cache: {cache.hits} hit(s), {cache.misses} miss(es)"
+                    + (f", evicted {removed} entr{'y' if removed == 1 else 'ies'}" if removed else "")
+                )
 
-            output_full_path = settings.output_folder / settings.output_filename
-            log_cb(f"Saving to {output_full_path}...")
-            target_wb.save(output_full_path)
-            target_wb.close()
+            if settings.row_filters:
+                log_cb(f"Row filters kept {rows_kept_total:,} of {rows_read_total:,} rows read")
+            if settings.dedupe_sheets:
+                log_cb(f"Deduplication: {dedupe_count} identical sheet(s) shared instead of copied")
+            if incidents:
+                log_cb(f"Resource limits: {len(incidents)} incident(s)")
+                for incident in incidents:
+                    log_cb(f"  ! {incident}")
+            if interner is not None:
+                log_cb(interner.summary())
+                if metrics_cb is not None:
+                    metrics_cb({
+                        "intern_lookups": interner.lookups,
+                        "intern_hits": interner.hits,
+                        "intern_hit_rate": interner.hit_rate,
+                        "intern_saved_bytes": interner.saved_bytes,
+                    })
+            if templates is not None and templates.lookups:
+                log_cb(templates.summary())
+                if metrics_cb is not None:
+                    metrics_cb({
+                        "template_lookups": templates.lookups,
+                        "template_hits": templates.hits,
+                        "template_items_reused": templates.items_reused,
+                    })
+
+            if settings.verify_output and verify_pairs:
+                OutputVerifier.verify(
+                    [
+                        (source_path, source_sheet, part_paths[part - 1], output_sheet)
+                        for source_path, source_sheet, part, output_sheet in verify_pairs
+                    ],
+                    settings,
+                    log_cb,
+                )
 
             log_cb("✓ Merge Complete!")
-            log_cb(f"✓ File saved: {output_full_path}")
+            if splitter.enabled:
+                log_cb(f"✓ {len(part_paths)} part(s) saved to {settings.output_folder}")
+                for path in part_paths:
+                    log_cb(f"  - {path.name}")
+                if index_path is not None:
+                    log_cb(f"✓ Index saved: {index_path}")
+            else:
+                log_cb(f"✓ File saved: {output_full_path}")
 
             return output_full_path
+        except MergeCancelled:
+            if splitter is not None:
+                splitter.abort()
+            log_cb("Merge cancelled.")
+            raise
         except Exception as e:
+            if splitter is not None:
+                splitter.abort()
             log_cb(f"CRITICAL ERROR in merge: {e}")
             import traceback
             log_cb(f"Traceback: {traceback.format_exc()}")
             raise
+        finally:
+            with ExcelMerger._running_lock:
+                ExcelMerger.running -= 1
 
 
-# --- GUI Application ---
+class MergeEvent:
+    """
+    One item of the ``AsyncExcelMerger.events`` stream.
 
-class MergeWorker(QThread):
-    progress_signal = pyqtSignal(int, int)  # current, total
-    log_signal = pyqtSignal(str)
-    finished_signal = pyqtSignal(str) # output path
-    error_signal = pyqtSignal(str)
+    ``kind`` is ``"log"`` (str), ``"progress"`` ((current, total) cells),
+    ``"status"`` (str), ``"metrics"`` (dict of throughput numbers) or
+    ``"done"`` (output path, always the last event).
+    """
+    def __init__(self, kind, data):
+        self.kind = kind
+        self.data = data
 
-    def __init__(self, files, settings):
-        super().__init__()
-        self.files = files
-        self.settings = settings
+    def __repr__(self):
+        return f"MergeEvent({self.kind!r}, {self.data!r})"
+
+
+class AsyncExcelMerger:
+    """
+    asyncio front-end for ``FolderScanner`` and ``ExcelMerger``.
+
+    Scans and merges run on ``executor`` (the loop's default one if None), so
+    the event loop stays free and many merges can run side by side. Events
+    are handed over through a bounded queue: when the consumer falls behind,
+    the merge thread blocks until it catches up. Cancelling the consuming
+    task stops the merge at its next sheet or progress tick.
+
+    Example::
+
+        merger = AsyncExcelMerger()
+        files = await merger.scan(folder)
+        async with contextlib.aclosing(merger.events(files, settings)) as events:
+            async for event in events:
+                ...
+    """
+
+    def __init__(self, executor=None, max_queued_events=256):
+        self.executor = executor
+        self.max_queued_events = max_queued_events
+
+    async def scan(self, folder_path, include_subfolders=False, skip_temp=True):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(FolderScanner.scan, folder_path, include_subfolders, skip_temp),
+        )
+
+    async def merge(self, files, settings, on_event=None):
+        """Run a merge to completion and return the output path."""
+        output_path = None
+        async with contextlib.aclosing(self.events(files, settings)) as events:
+            async for event in events:
+                if on_event is not None:
+                    result = on_event(event)
+                    if inspect.isawaitable(result):
+                        await result
+                if event.kind == "done":
+                    output_path = event.data
+        return output_path
+
+    async def events(self, files, settings):
+        """Run a merge, yielding ``MergeEvent`` items as it progresses."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.max_queued_events)
+        cancel_event = threading.Event()
+
+        def emit(kind, data):
+            # Runs on the merge thread; blocks while the queue is full
+            if cancel_event.is_set():
+                raise MergeCancelled("Merge cancelled")
+            put = asyncio.run_coroutine_threadsafe(queue.put(MergeEvent(kind, data)), loop)
+            while True:
+                try:
+                    put.result(timeout=0.1)
+                    return
+                except concurrent.futures.TimeoutError:
+                    if cancel_event.is_set():
+                        put.cancel()
+                        raise MergeCancelled("Merge cancelled")
+
+        def run():
+            return ExcelMerger.merge(
+                files,
+                settings,
+                lambda msg: emit("log", msg),
+                lambda current, total: emit("progress", (current, total)),
+                status_cb=lambda text: emit("status", text),
+                cancel_event=cancel_event,
+                metrics_cb=lambda metrics: emit("metrics", metrics),
+            )
 
-    def run(self):
+        worker = loop.run_in_executor(self.executor, run)
+        get = None
         try:
-            def log_cb(msg):
-                self.log_signal.emit(msg)
+            while True:
+                get = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({get, worker}, return_when=asyncio.FIRST_COMPLETED)
+                if get in done:
+                    yield get.result()
+                    continue
+
+                get.cancel()
+                while not queue.empty():
+                    yield queue.get_nowait()
+                yield MergeEvent("done", worker.result())
+                return
+        finally:
+            # Pending when the consumer is cancelled inside asyncio.wait
+            if get is not None:
+                get.cancel()
+            if not worker.done():
+                cancel_event.set()
+                # Keep draining so a producer blocked on a full queue can exit
+                while not worker.done():
+                    while not queue.empty():
+                        queue.get_nowait()
+                    await asyncio.wait({worker}, timeout=0.1)
+            if worker.done() and not worker.cancelled():
+                worker.exception()  # mark as retrieved
+
+
+# --- GUI Application ---
+# Defined only when run as the app, so importing the engine or starting
+# an IsolatedReader child never constructs a QApplication
+
+if __name__ == "__main__":
+    # Force qfluentwidgets to use PyQt6 (Must be set before importing qfluentwidgets)
+    os.environ["QT_API"] = "pyqt6"
+
+    from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize
+    from PyQt6.QtWidgets import (
+        QApplication, QFileDialog, QTableWidgetItem, QHeaderView, QFrame, 
+        QVBoxLayout, QHBoxLayout, QWidget, QSizePolicy
+    )
+    from PyQt6.QtGui import QIcon, QColor, QFont
+
+    # Create QApplication BEFORE importing qfluentwidgets to avoid "Must construct a QApplication" error
+    # This is necessary because qfluentwidgets might initialize widgets at module level or during import
+    if QApplication.instance() is None:
+        app = QApplication(sys.argv)
+    else:
+        app = QApplication.instance()
+
+    from qfluentwidgets import (
+        FluentWindow, SubtitleLabel, PrimaryPushButton, LineEdit, PushButton, 
+        TableWidget, CheckBox, ProgressBar, TextEdit, 
+        InfoBar, InfoBarPosition, Theme, setTheme, setThemeColor,
+        StrongBodyLabel, CaptionLabel, BodyLabel, CardWidget,
+        TransparentToolButton, FluentIcon as FIF,
+        TitleLabel, ComboBox, SwitchButton
+    )
+
+    class MergeWorker(QThread):
+        progress_signal = pyqtSignal(int, int)  # per-mille done, 1000
+        status_signal = pyqtSignal(str)  # throughput / ETA line
+        log_signal = pyqtSignal(str)
+        finished_signal = pyqtSignal(str) # output path
+        error_signal = pyqtSignal(str)
+
+        def __init__(self, files, settings):
+            super().__init__()
+            self.files = files
+            self.settings = settings
+
+        def run(self):
+            try:
+                def log_cb(msg):
+                    self.log_signal.emit(msg)
             
-            def progress_cb(current, total):
-                self.progress_signal.emit(current, total)
+                def progress_cb(current, total):
+                    # Cell counts can exceed a C int; the signal carries per-mille.
+                    self.progress_signal.emit(current * 1000 // max(total, 1), 1000)
 
-            output_path = ExcelMerger.merge(
-                self.files, self.settings, log_cb, progress_cb
-            )
-            self.finished_signal.emit(str(output_path))
-        except Exception as e:
-            self.error_signal.emit(str(e))
+                def status_cb(text):
+                    self.status_signal.emit(text)
 
-class ExcelMergerWindow(FluentWindow):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("Advanced Excel Merger")
-        self.resize(1100, 800)
-        self.setWindowIcon(QIcon("icon.ico"))
+                output_path = ExcelMerger.merge(
+                    self.files, self.settings, log_cb, progress_cb, status_cb
+                )
+                self.finished_signal.emit(str(output_path) if output_path else "")
+            except Exception as e:
+                self.error_signal.emit(str(e))
+
+    class ExcelMergerWindow(FluentWindow):
+        # label -> (split_max_sheets, split_max_cells, split_max_mb)
+        SPLIT_PRESETS = {
+            "Single output file": (0, 0, 0),
+            "Split every 100 sheets": (100, 0, 0),
+            "Split every 500 sheets": (500, 0, 0),
+            "Split every 5M cells": (0, 5_000_000, 0),
+            "Split every 100 MB (est.)": (0, 0, 100),
+        }
+
+        def __init__(self):
+            super().__init__()
+            self.setWindowTitle("Advanced Excel Merger")
+            self.resize(1100, 800)
+            self.setWindowIcon(QIcon("icon.ico"))
         
-        # Theme
-        setTheme(Theme.LIGHT)
-        setThemeColor('#0078D4')
+            # Theme
+            setTheme(Theme.LIGHT)
+            setThemeColor('#0078D4')
 
-        self.files_data = []
-        self.current_source_folder = ""
-        self.last_output_path = None
+            self.files_data = []
+            self.current_source_folder = ""
+            self.last_output_path = None
 
-        self.init_ui()
+            self.init_ui()
 
-    def init_ui(self):
-        self.main_widget = QWidget()
-        self.main_widget.setObjectName("mergeInterface")
-        # self.setCentralWidget(self.main_widget) # Not available in FluentWindow
+        def init_ui(self):
+            self.main_widget = QWidget()
+            self.main_widget.setObjectName("mergeInterface")
+            # self.setCentralWidget(self.main_widget) # Not available in FluentWindow
         
-        # Add the main widget as a sub-interface
-        # We give it a name and icon to show in the navigation bar (even if we have only one)
-        self.addSubInterface(self.main_widget, FIF.HOME, "Merge")
-
-        self.v_layout = QVBoxLayout(self.main_widget)
-        self.v_layout.setContentsMargins(30, 30, 30, 30)
-        self.v_layout.setSpacing(20)
-
-        # Title
-        self.title_label = TitleLabel("📊 Advanced Excel Merger", self.main_widget)
-        self.subtitle_label = CaptionLabel("Preserves formulas, formatting, and tables", self.main_widget)
-        self.subtitle_label.setTextColor(QColor(100, 100, 100), QColor(200, 200, 200))
+            # Add the main widget as a sub-interface
+            # We give it a name and icon to show in the navigation bar (even if we have only one)
+            self.addSubInterface(self.main_widget, FIF.HOME, "Merge")
+
+            self.v_layout = QVBoxLayout(self.main_widget)
+            self.v_layout.setContentsMargins(30, 30, 30, 30)
+            self.v_layout.setSpacing(20)
+
+            # Title
+            self.title_label = TitleLabel("📊 Advanced Excel Merger", self.main_widget)
+            self.subtitle_label = CaptionLabel("Preserves formulas, formatting, and tables", self.main_widget)
+            self.subtitle_label.setTextColor(QColor(100, 100, 100), QColor(200, 200, 200))
         
-        title_layout = QVBoxLayout()
-        title_layout.addWidget(self.title_label)
-        title_layout.addWidget(self.subtitle_label)
-        self.v_layout.addLayout(title_layout)
-
-        # Source Selection Card
-        self.source_card = CardWidget(self)
-        source_layout = QVBoxLayout(self.source_card)
-        source_layout.setContentsMargins(20, 20, 20, 20)
+            title_layout = QVBoxLayout()
+            title_layout.addWidget(self.title_label)
+            title_layout.addWidget(self.subtitle_label)
+            self.v_layout.addLayout(title_layout)
+
+            # Source Selection Card
+            self.source_card = CardWidget(self)
+            source_layout = QVBoxLayout(self.source_card)
+            source_layout.setContentsMargins(20, 20, 20, 20)
         
-        source_header = StrongBodyLabel("Source Folder", self.source_card)
-        source_layout.addWidget(source_header)
+            source_header = StrongBodyLabel("Source Folder", self.source_card)
+            source_layout.addWidget(source_header)
 
-        h_source = QHBoxLayout()
-        self.source_path_edit = LineEdit(self.source_card)
-        self.source_path_edit.setPlaceholderText("Select a folder containing Excel files...")
-        self.source_path_edit.setReadOnly(True)
+            h_source = QHBoxLayout()
+            self.source_path_edit = LineEdit(self.source_card)
+            self.source_path_edit.setPlaceholderText("Select a folder containing Excel files...")
+            self.source_path_edit.setReadOnly(True)
         
-        self.btn_browse = PushButton("Browse", self.source_card, FIF.FOLDER)
-        self.btn_browse.clicked.connect(self.browse_source)
+            self.btn_browse = PushButton("Browse", self.source_card, FIF.FOLDER)
+            self.btn_browse.clicked.connect(self.browse_source)
         
-        self.btn_scan = PrimaryPushButton("Scan Folder", self.source_card, FIF.SYNC)
-        self.btn_scan.clicked.connect(self.scan_folder)
+            self.btn_scan = PrimaryPushButton("Scan Folder", self.source_card, FIF.SYNC)
+            self.btn_scan.clicked.connect(self.scan_folder)
 
-        h_source.addWidget(self.source_path_edit, 1)
-        h_source.addWidget(self.btn_browse)
-        h_source.addWidget(self.btn_scan)
-        source_layout.addLayout(h_source)
+            h_source.addWidget(self.source_path_edit, 1)
+            h_source.addWidget(self.btn_browse)
+            h_source.addWidget(self.btn_scan)
+            source_layout.addLayout(h_source)
         
-        self.v_layout.addWidget(self.source_card)
-
-        # File List
-        self.table = TableWidget(self)
-        self.table.setBorderVisible(True)
-        self.table.setBorderRadius(8)
-        self.table.setWordWrap(False)
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["✓", "File Name", "Sheets", "Size", "Path"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
-        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
-        self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeMode.Stretch)
-        self.table.verticalHeader().hide()
+            self.v_layout.addWidget(self.source_card)
+
+            # File List
+            self.table = TableWidget(self)
+            self.table.setBorderVisible(True)
+            self.table.setBorderRadius(8)
+            self.table.setWordWrap(False)
+            self.table.setColumnCount(5)
+            self.table.setHorizontalHeaderLabels(["✓", "File Name", "Sheets", "Size", "Path"])
+            self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+            self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+            self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeMode.Stretch)
+            self.table.verticalHeader().hide()
         
-        self.v_layout.addWidget(self.table, 1)
+            self.v_layout.addWidget(self.table, 1)
 
-        # File Actions
-        h_file_actions = QHBoxLayout()
-        self.btn_select_all = PushButton("Select All", self, FIF.CHECKBOX)
-        self.btn_select_all.clicked.connect(lambda: self.toggle_all(True))
+            # File Actions
+            h_file_actions = QHBoxLayout()
+            self.btn_select_all = PushButton("Select All", self, FIF.CHECKBOX)
+            self.btn_select_all.clicked.connect(lambda: self.toggle_all(True))
         
-        self.btn_deselect_all = PushButton("Deselect All", self, FIF.CANCEL)
-        self.btn_deselect_all.clicked.connect(lambda: self.toggle_all(False))
+            self.btn_deselect_all = PushButton("Deselect All", self, FIF.CANCEL)
+            self.btn_deselect_all.clicked.connect(lambda: self.toggle_all(False))
         
-        self.lbl_file_count = BodyLabel("0 files found", self)
+            self.lbl_file_count = BodyLabel("0 files found", self)
         
-        h_file_actions.addWidget(self.btn_select_all)
-        h_file_actions.addWidget(self.btn_deselect_all)
-        h_file_actions.addWidget(self.lbl_file_count)
-        h_file_actions.addStretch()
+            h_file_actions.addWidget(self.btn_select_all)
+            h_file_actions.addWidget(self.btn_deselect_all)
+            h_file_actions.addWidget(self.lbl_file_count)
+            h_file_actions.addStretch()
         
-        self.v_layout.addLayout(h_file_actions)
+            self.v_layout.addLayout(h_file_actions)
 
-        # Settings & Output Card
-        self.settings_card = CardWidget(self)
-        settings_layout = QVBoxLayout(self.settings_card)
-        settings_layout.setContentsMargins(20, 20, 20, 20)
+            # Settings & Output Card
+            self.settings_card = CardWidget(self)
+            settings_layout = QVBoxLayout(self.settings_card)
+            settings_layout.setContentsMargins(20, 20, 20, 20)
 
-        # Grid for settings
-        h_settings = QHBoxLayout()
+            # Grid for settings
+            h_settings = QHBoxLayout()
         
-        # Left: Search & Options
-        v_opts = QVBoxLayout()
-        v_opts.addWidget(StrongBodyLabel("Options", self.settings_card))
+            # Left: Search & Options
+            v_opts = QVBoxLayout()
+            v_opts.addWidget(StrongBodyLabel("Options", self.settings_card))
         
-        self.chk_subfolders = CheckBox("Include Subfolders", self.settings_card)
-        self.chk_skip_temp = CheckBox("Skip Temporary Files (~$)", self.settings_card)
-        self.chk_skip_temp.setChecked(True)
-        self.chk_preserve = CheckBox("Preserve Formulas", self.settings_card)
-        self.chk_preserve.setChecked(True)
-        self.chk_index = CheckBox("Create Index Sheet", self.settings_card)
-        self.chk_index.setChecked(True)
+            self.chk_subfolders = CheckBox("Include Subfolders", self.settings_card)
+            self.chk_skip_temp = CheckBox("Skip Temporary Files (~$)", self.settings_card)
+            self.chk_skip_temp.setChecked(True)
+            self.chk_preserve = CheckBox("Preserve Formulas", self.settings_card)
+            self.chk_preserve.setChecked(True)
+            self.chk_index = CheckBox("Create Index Sheet", self.settings_card)
+            self.chk_index.setChecked(True)
+            self.chk_cache = CheckBox("Use Sheet Cache", self.settings_card)
+            self.chk_cache.setToolTip("Reuse converted sheets from earlier merges of unchanged files")
+            self.chk_dry_run = CheckBox("Dry Run (plan only)", self.settings_card)
+            self.chk_verify = CheckBox("Verify Output After Merge", self.settings_card)
+            self.chk_dedupe = CheckBox("Share Identical Sheets", self.settings_card)
+            self.chk_dedupe.setToolTip("Keep one copy of sheets that are identical across files")
+            self.chk_trim = CheckBox("Trim Empty Formatting", self.settings_card)
+            self.chk_trim.setToolTip("Skip styled but empty rows and columns past the last content")
         
-        v_opts.addWidget(self.chk_subfolders)
-        v_opts.addWidget(self.chk_skip_temp)
-        v_opts.addWidget(self.chk_preserve)
-        v_opts.addWidget(self.chk_index)
-        v_opts.addStretch()
+            v_opts.addWidget(self.chk_subfolders)
+            v_opts.addWidget(self.chk_skip_temp)
+            v_opts.addWidget(self.chk_preserve)
+            v_opts.addWidget(self.chk_index)
+            v_opts.addWidget(self.chk_cache)
+            v_opts.addWidget(self.chk_dry_run)
+            v_opts.addWidget(self.chk_verify)
+            v_opts.addWidget(self.chk_dedupe)
+            v_opts.addWidget(self.chk_trim)
+            v_opts.addStretch()
         
-        h_settings.addLayout(v_opts)
+            h_settings.addLayout(v_opts)
         
-        # Right: Output
-        v_out = QVBoxLayout()
-        v_out.addWidget(StrongBodyLabel("Output", self.settings_card))
+            # Right: Output
+            v_out = QVBoxLayout()
+            v_out.addWidget(StrongBodyLabel("Output", self.settings_card))
         
-        h_out_path = QHBoxLayout()
-        self.out_path_edit = LineEdit(self.settings_card)
-        self.out_path_edit.setPlaceholderText("Output folder...")
-        self.btn_out_browse = PushButton("...", self.settings_card)
-        self.btn_out_browse.setFixedWidth(40)
-        self.btn_out_browse.clicked.connect(self.browse_output)
+            h_out_path = QHBoxLayout()
+            self.out_path_edit = LineEdit(self.settings_card)
+            self.out_path_edit.setPlaceholderText("Output folder...")
+            self.btn_out_browse = PushButton("...", self.settings_card)
+            self.btn_out_browse.setFixedWidth(40)
+            self.btn_out_browse.clicked.connect(self.browse_output)
         
-        h_out_path.addWidget(self.out_path_edit)
-        h_out_path.addWidget(self.btn_out_browse)
+            h_out_path.addWidget(self.out_path_edit)
+            h_out_path.addWidget(self.btn_out_browse)
         
-        self.out_filename_edit = LineEdit(self.settings_card)
-        self.out_filename_edit.setText("MergedWorkbook.xlsx")
-        self.out_filename_edit.setPlaceholderText("Filename.xlsx")
+            self.out_filename_edit = LineEdit(self.settings_card)
+            self.out_filename_edit.setText("MergedWorkbook.xlsx")
+            self.out_filename_edit.setPlaceholderText("Filename.xlsx")
         
-        self.chk_auto_open = SwitchButton("Open file after merge", self.settings_card)
-        self.chk_auto_open.setChecked(True)
+            self.cmb_split = ComboBox(self.settings_card)
+            self.cmb_split.addItems(list(self.SPLIT_PRESETS))
+            self.cmb_split.setCurrentIndex(0)
+
+            self.chk_auto_open = SwitchButton("Open file after merge", self.settings_card)
+            self.chk_auto_open.setChecked(True)
         
-        v_out.addLayout(h_out_path)
-        v_out.addWidget(self.out_filename_edit)
-        v_out.addWidget(self.chk_auto_open)
-        v_out.addStretch()
+            v_out.addLayout(h_out_path)
+            v_out.addWidget(self.out_filename_edit)
+            v_out.addWidget(self.cmb_split)
+
+            self.filter_edit = LineEdit(self.settings_card)
+            self.filter_edit.setPlaceholderText("Row filter, e.g. Region in North, South; Amount >= 100")
+            self.filter_edit.setClearButtonEnabled(True)
+            v_out.addWidget(self.filter_edit)
+            v_out.addWidget(self.chk_auto_open)
+            v_out.addStretch()
         
-        h_settings.addLayout(v_out)
+            h_settings.addLayout(v_out)
         
-        settings_layout.addLayout(h_settings)
-        self.v_layout.addWidget(self.settings_card)
-
-        # Merge Button & Progress
-        self.btn_merge = PrimaryPushButton("🚀 MERGE EXCEL FILES", self)
-        self.btn_merge.setFixedHeight(50)
-        self.btn_merge.setFont(QFont("Segoe UI", 12, QFont.Weight.Bold))
-        self.btn_merge.clicked.connect(self.start_merge)
-        self.v_layout.addWidget(self.btn_merge)
-
-        self.progress_bar = ProgressBar(self)
-        self.progress_bar.setRange(0, 100)
-        self.progress_bar.setValue(0)
-        self.v_layout.addWidget(self.progress_bar)
-
-        # Log
-        self.log_area = TextEdit(self)
-        self.log_area.setReadOnly(True)
-        self.log_area.setFixedHeight(150)
-        self.log_area.setPlaceholderText("Log output will appear here...")
-        self.v_layout.addWidget(self.log_area)
-
-    def browse_source(self):
-        path = QFileDialog.getExistingDirectory(self, "Select Source Folder")
-        if path:
-            self.source_path_edit.setText(path)
-            self.current_source_folder = path
-            if not self.out_path_edit.text():
+            settings_layout.addLayout(h_settings)
+            self.v_layout.addWidget(self.settings_card)
+
+            # Merge Button & Progress
+            self.btn_merge = PrimaryPushButton("🚀 MERGE EXCEL FILES", self)
+            self.btn_merge.setFixedHeight(50)
+            self.btn_merge.setFont(QFont("Segoe UI", 12, QFont.Weight.Bold))
+            self.btn_merge.clicked.connect(self.start_merge)
+            self.v_layout.addWidget(self.btn_merge)
+
+            self.progress_bar = ProgressBar(self)
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(0)
+            self.v_layout.addWidget(self.progress_bar)
+
+            self.lbl_status = CaptionLabel("", self)
+            self.v_layout.addWidget(self.lbl_status)
+
+            # Log
+            self.log_area = TextEdit(self)
+            self.log_area.setReadOnly(True)
+            self.log_area.setFixedHeight(150)
+            self.log_area.setPlaceholderText("Log output will appear here...")
+            self.v_layout.addWidget(self.log_area)
+
+        def browse_source(self):
+            path = QFileDialog.getExistingDirectory(self, "Select Source Folder")
+            if path:
+                self.source_path_edit.setText(path)
+                self.current_source_folder = path
+                if not self.out_path_edit.text():
+                    self.out_path_edit.setText(path)
+                self.scan_folder()
+
+        def browse_output(self):
+            path = QFileDialog.getExistingDirectory(self, "Select Output Folder")
+            if path:
                 self.out_path_edit.setText(path)
-            self.scan_folder()
 
-    def browse_output(self):
-        path = QFileDialog.getExistingDirectory(self, "Select Output Folder")
-        if path:
-            self.out_path_edit.setText(path)
+        def scan_folder(self):
+            folder = self.source_path_edit.text()
+            if not folder:
+                return
 
-    def scan_folder(self):
-        folder = self.source_path_edit.text()
-        if not folder:
-            return
-
-        self.table.setRowCount(0)
-        self.files_data = FolderScanner.scan(
-            folder, 
-            include_subfolders=self.chk_subfolders.isChecked(),
-            skip_temp=self.chk_skip_temp.isChecked()
-        )
+            self.table.setRowCount(0)
+            self.files_data = FolderScanner.scan(
+                folder, 
+                include_subfolders=self.chk_subfolders.isChecked(),
+                skip_temp=self.chk_skip_temp.isChecked()
+            )
         
-        self.lbl_file_count.setText(f"{len(self.files_data)} files found")
+            self.lbl_file_count.setText(f"{len(self.files_data)} files found")
         
-        for i, info in enumerate(self.files_data):
-            self.table.insertRow(i)
+            for i, info in enumerate(self.files_data):
+                self.table.insertRow(i)
             
-            # Checkbox item
-            item_chk = QTableWidgetItem()
-            item_chk.setCheckState(Qt.CheckState.Checked if info.selected else Qt.CheckState.Unchecked)
-            self.table.setItem(i, 0, item_chk)
+                # Checkbox item
+                item_chk = QTableWidgetItem()
+                item_chk.setCheckState(Qt.CheckState.Checked if info.selected else Qt.CheckState.Unchecked)
+                self.table.setItem(i, 0, item_chk)
             
-            self.table.setItem(i, 1, QTableWidgetItem(info.display_name))
-            self.table.setItem(i, 2, QTableWidgetItem(str(info.sheet_count)))
+                self.table.setItem(i, 1, QTableWidgetItem(info.display_name))
+                self.table.setItem(i, 2, QTableWidgetItem(str(info.sheet_count)))
             
-            size_mb = info.path.stat().st_size / (1024 * 1024)
-            self.table.setItem(i, 3, QTableWidgetItem(f"{size_mb:.2f} MB"))
+                size_bytes = info.manifest.size if info.manifest else info.path.stat().st_size
+                size_mb = size_bytes / (1024 * 1024)
+                self.table.setItem(i, 3, QTableWidgetItem(f"{size_mb:.2f} MB"))
             
-            self.table.setItem(i, 4, QTableWidgetItem(str(info.path)))
-
-        self.table.itemChanged.connect(self.on_item_changed)
-
-    def on_item_changed(self, item):
-        if item.column() == 0:
-            row = item.row()
-            if row < len(self.files_data):
-                self.files_data[row].selected = (item.checkState() == Qt.CheckState.Checked)
-
-    def toggle_all(self, select):
-        state = Qt.CheckState.Checked if select else Qt.CheckState.Unchecked
-        self.table.blockSignals(True)
-        for i in range(self.table.rowCount()):
-            self.table.item(i, 0).setCheckState(state)
-            if i < len(self.files_data):
-                self.files_data[i].selected = select
-        self.table.blockSignals(False)
-
-    def start_merge(self):
-        if not self.files_data:
-            InfoBar.warning("No files", "Please scan a folder first.", parent=self)
-            return
-
-        selected = [f for f in self.files_data if f.selected]
-        if not selected:
-            InfoBar.warning("No selection", "Please select at least one file to merge.", parent=self)
-            return
-
-        out_folder = self.out_path_edit.text()
-        if not out_folder:
-            InfoBar.error("Missing Output", "Please select an output folder.", parent=self)
-            return
+                self.table.setItem(i, 4, QTableWidgetItem(str(info.path)))
+
+            self.table.itemChanged.connect(self.on_item_changed)
+
+        def on_item_changed(self, item):
+            if item.column() == 0:
+                row = item.row()
+                if row < len(self.files_data):
+                    self.files_data[row].selected = (item.checkState() == Qt.CheckState.Checked)
+
+        def toggle_all(self, select):
+            state = Qt.CheckState.Checked if select else Qt.CheckState.Unchecked
+            self.table.blockSignals(True)
+            for i in range(self.table.rowCount()):
+                self.table.item(i, 0).setCheckState(state)
+                if i < len(self.files_data):
+                    self.files_data[i].selected = select
+            self.table.blockSignals(False)
+
+        def start_merge(self):
+            if not self.files_data:
+                InfoBar.warning("No files", "Please scan a folder first.", parent=self)
+                return
+
+            selected = [f for f in self.files_data if f.selected]
+            if not selected:
+                InfoBar.warning("No selection", "Please select at least one file to merge.", parent=self)
+                return
+
+            out_folder = self.out_path_edit.text()
+            if not out_folder:
+                InfoBar.error("Missing Output", "Please select an output folder.", parent=self)
+                return
 
-        settings = MergeSettings()
-        settings.include_subfolders = self.chk_subfolders.isChecked()
-        settings.skip_temp_files = self.chk_skip_temp.isChecked()
-        settings.output_folder = pathlib.Path(out_folder)
-        settings.output_filename = self.out_filename_edit.text()
-        settings.create_index_sheet = self.chk_index.isChecked()
-        settings.preserve_formulas = self.chk_preserve.isChecked()
-
-        self.btn_merge.setEnabled(False)
-        self.progress_bar.setValue(0)
-        self.log_area.clear()
+            try:
+                row_filters = RowFilter.parse(self.filter_edit.text())
+            except ValueError as e:
+                InfoBar.error("Invalid Row Filter", str(e), parent=self)
+                return
+
+            settings = MergeSettings()
+            settings.row_filters = row_filters
+            settings.include_subfolders = self.chk_subfolders.isChecked()
+            settings.skip_temp_files = self.chk_skip_temp.isChecked()
+            settings.output_folder = pathlib.Path(out_folder)
+            settings.output_filename = self.out_filename_edit.text()
+            settings.create_index_sheet = self.chk_index.isChecked()
+            settings.preserve_formulas = self.chk_preserve.isChecked()
+            settings.use_sheet_cache = self.chk_cache.isChecked()
+            settings.dry_run = self.chk_dry_run.isChecked()
+            settings.verify_output = self.chk_verify.isChecked()
+            settings.dedupe_sheets = self.chk_dedupe.isChecked()
+            settings.trim_used_range = self.chk_trim.isChecked()
+            (
+                settings.split_max_sheets,
+                settings.split_max_cells,
+                settings.split_max_mb,
+            ) = self.SPLIT_PRESETS.get(self.cmb_split.currentText(), (0, 0, 0))
+
+            self.btn_merge.setEnabled(False)
+            self.progress_bar.setValue(0)
+            self.lbl_status.setText("")
+            self.log_area.clear()
         
-        self.worker = MergeWorker(self.files_data, settings)
-        self.worker.log_signal.connect(self.append_log)
-        self.worker.progress_signal.connect(self.update_progress)
-        self.worker.finished_signal.connect(self.on_merge_finished)
-        self.worker.error_signal.connect(self.on_merge_error)
-        self.worker.start()
-
-    def append_log(self, msg):
-        self.log_area.append(msg)
-
-    def update_progress(self, current, total):
-        if total > 0:
-            val = int((current / total) * 100)
-            self.progress_bar.setValue(val)
-
-    def on_merge_finished(self, output_path):
-        self.btn_merge.setEnabled(True)
-        self.progress_bar.setValue(100)
-        self.last_output_path = pathlib.Path(output_path)
+            self.worker = MergeWorker(self.files_data, settings)
+            self.worker.log_signal.connect(self.append_log)
+            self.worker.progress_signal.connect(self.update_progress)
+            self.worker.status_signal.connect(self.lbl_status.setText)
+            self.worker.finished_signal.connect(self.on_merge_finished)
+            self.worker.error_signal.connect(self.on_merge_error)
+            self.worker.start()
+
+        def append_log(self, msg):
+            self.log_area.append(msg)
+
+        def update_progress(self, current, total):
+            if total > 0:
+                val = int((current / total) * 100)
+                self.progress_bar.setValue(val)
+
+        def on_merge_finished(self, output_path):
+            self.btn_merge.setEnabled(True)
+            if not output_path:
+                InfoBar.info("Dry Run", "Merge plan written to the log.", parent=self)
+                return
+
+            self.progress_bar.setValue(100)
+            self.last_output_path = pathlib.Path(output_path)
         
-        InfoBar.success("Success", f"Merged {len([f for f in self.files_data if f.selected])} files successfully!", parent=self)
+            InfoBar.success("Success", f"Merged {len([f for f in self.files_data if f.selected])} files successfully!", parent=self)
         
-        if self.chk_auto_open.isChecked():
-            self.open_file(output_path)
-
-    def on_merge_error(self, err_msg):
-        self.btn_merge.setEnabled(True)
-        if "Permission denied" in err_msg:
-            InfoBar.error(
-                "File Open Error", 
-                "Could not save the file. Please close 'MergedWorkbook.xlsx' and try again.", 
-                parent=self,
-                duration=5000
-            )
-        else:
-            InfoBar.error("Error", f"Merge failed: {err_msg}", parent=self)
-        self.log_area.append(f"CRITICAL ERROR: {err_msg}")
+            if self.chk_auto_open.isChecked():
+                self.open_file(output_path)
+
+        def on_merge_error(self, err_msg):
+            self.btn_merge.setEnabled(True)
+            if "Permission denied" in err_msg:
+                InfoBar.error(
+                    "File Open Error", 
+                    "Could not save the file. Please close 'MergedWorkbook.xlsx' and try again.", 
+                    parent=self,
+                    duration=5000
+                )
+            else:
+                InfoBar.error("Error", f"Merge failed: {err_msg}", parent=self)
+            self.log_area.append(f"CRITICAL ERROR: {err_msg}")
 
-    def open_file(self, filepath):
-        try:
-            filepath_str = str(filepath)
-            os.startfile(filepath_str)
-        except Exception as e:
-            self.append_log(f"Could not open file: {e}")
+        def open_file(self, filepath):
+            try:
+                filepath_str = str(filepath)
+                os.startfile(filepath_str)
+            except Exception as e:
+                self.append_log(f"Could not open file: {e}")
 
-if __name__ == "__main__":
-    # app is already created at module level
+    # app was created above, before the qfluentwidgets import
     window = ExcelMergerWindow()
     window.show()
     sys.exit(app.exec())
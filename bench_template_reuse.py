@@ -0,0 +1,126 @@
+"""
+Benchmark for template reuse (MergeSettings.reuse_templates).
+
+Builds a batch of workbooks from one template and merges it twice, without
+and with reuse, then times building vs. replaying each kind of sheet
+structure on its own. The template sheet has 30 data rows, 12 column
+widths, 40 row heights, 15 merged ranges, 10 data validations, 10 CF rules
+and 1 table.
+
+    python bench_template_reuse.py [--files 500] [--folder DIR] > bench_output.txt
+"""
+
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+
+import openpyxl
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.datavalidation import DataValidation
+from openpyxl.worksheet.table import Table, TableStyleInfo
+
+from AdvanceExcelMerger import EnhancedSheetCopier, ExcelMerger, FolderScanner, MergeSettings
+
+
+def make_template_file(path, index):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Form"
+    for col in range(1, 13):
+        ws.column_dimensions[get_column_letter(col)].width = 8 + col
+    for row in range(1, 41):
+        ws.row_dimensions[row].height = 18
+    ws.append([f"H{col}" for col in range(1, 13)])
+    for row in range(2, 31):
+        ws.append([index * 100 + row] + [f"v{col}" for col in range(2, 13)])
+    for k in range(15):
+        if k < 8:
+            ws.merge_cells(f"A{32 + k}:C{32 + k}")
+        else:
+            ws.merge_cells(f"E{24 + k}:G{24 + k}")
+    for k in range(10):
+        column = get_column_letter(k + 2)
+        dv = DataValidation(type="list", formula1='"Yes,No,Maybe"', allow_blank=True)
+        dv.add(f"{column}2:{column}30")
+        ws.add_data_validation(dv)
+    for k in range(10):
+        column = get_column_letter(k + 1)
+        ws.conditional_formatting.add(
+            f"{column}2:{column}30",
+            CellIsRule(
+                operator="greaterThan",
+                formula=["100"],
+                fill=PatternFill("solid", start_color="FFFF00"),
+                font=Font(bold=True),
+            ),
+        )
+    table = Table(displayName="FormTable", ref="A1:L30")
+    table.tableStyleInfo = TableStyleInfo(name="TableStyleMedium9", showRowStripes=True)
+    ws.add_table(table)
+    wb.save(path)
+
+
+def bench_merge(files, out_folder):
+    for reuse in (False, True):
+        settings = MergeSettings()
+        settings.output_folder = out_folder
+        settings.output_filename = f"reuse_{reuse}.xlsx"
+        settings.reuse_templates = reuse
+        logs = []
+        started = time.perf_counter()
+        ExcelMerger.merge(files, settings, logs.append, lambda current, total: None)
+        elapsed = time.perf_counter() - started
+        summary = next((line for line in logs if line.startswith("Template reuse")), "no template lookups")
+        print(f"reuse_templates={reuse}: {elapsed:.1f}s  ({summary})")
+
+
+def bench_structure(path, repeat=100):
+    """Per-sheet cost of building vs. replaying each kind of structure record."""
+    wb = openpyxl.load_workbook(path)
+    records = list(EnhancedSheetCopier.iter_records(wb.active))
+    target = openpyxl.Workbook()
+    for kind in EnhancedSheetCopier.STRUCTURE_KINDS:
+        part = [r for r in records if r[0] == kind]
+        if not part:
+            continue
+        prepared = EnhancedSheetCopier._build_structure(target.create_sheet(f"p_{kind}"), part)
+        started = time.perf_counter()
+        for i in range(repeat):
+            EnhancedSheetCopier._build_structure(target.create_sheet(f"b_{kind}{i}"), part)
+        build = (time.perf_counter() - started) / repeat
+        started = time.perf_counter()
+        for i in range(repeat):
+            EnhancedSheetCopier._replay_structure(target.create_sheet(f"r_{kind}{i}"), prepared)
+        replay = (time.perf_counter() - started) / repeat
+        print(f"  {kind:<6} build {build * 1000:.2f} ms  replay {replay * 1000:.2f} ms per sheet")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=500, help="number of same-template files")
+    parser.add_argument("--folder", type=pathlib.Path, help="keep the generated files here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_template_reuse_") as tmp:
+        folder = args.folder or pathlib.Path(tmp) / "src"
+        folder.mkdir(parents=True, exist_ok=True)
+        for i in range(args.files):
+            path = folder / f"f{i:03d}.xlsx"
+            if not path.exists():
+                make_template_file(path, i)
+        out_folder = pathlib.Path(tmp) / "out"
+        out_folder.mkdir()
+
+        files = FolderScanner.scan(str(folder), False, True)[:args.files]
+        print(f"{len(files)} same-template files, Python {sys.version.split()[0]}, openpyxl {openpyxl.__version__}")
+        bench_merge(files, out_folder)
+        print("Structure build vs. replay:")
+        bench_structure(files[0].path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+from datetime import datetime
+
+import pytest
+
+from AdvanceExcelMerger import RowFilter, RowMap
+
+
+# --- RowFilter.parse ---
+
+
+def test_parse_comparison():
+    (f,) = RowFilter.parse("Qty >= 100")
+    assert (f.column, f.op, f.value) == ("Qty", ">=", 100)
+
+
+def test_parse_multiple_clauses():
+    filters = RowFilter.parse("Region in North, South; Date between 2026-07-01 and 2026-09-30; col:C >= 1.5")
+    assert [(f.column, f.op) for f in filters] == [
+        ("Region", "in"), ("Date", "between"), ("col:C", ">="),
+    ]
+    assert filters[0].value == frozenset({"North", "South"})
+    assert filters[1].value == (datetime(2026, 7, 1), datetime(2026, 9, 30))
+    assert filters[2].value == 1.5
+
+
+def test_parse_not_in_before_in():
+    (f,) = RowFilter.parse("Status not in Closed, Lost")
+    assert (f.column, f.op, f.value) == ("Status", "not in", frozenset({"Closed", "Lost"}))
+
+
+def test_parse_quoted_value_stays_text():
+    (f,) = RowFilter.parse("Code == '007'")
+    assert f.value == "007"
+
+
+def test_parse_quoted_column():
+    (f,) = RowFilter.parse('"Unit Price" < 10')
+    assert f.column == "Unit Price"
+
+
+def test_parse_skips_empty_clauses():
+    assert len(RowFilter.parse("Qty > 1;; ")) == 1
+
+
+@pytest.mark.parametrize("text", ["Qty", "Qty between 1", "== 5"])
+def test_parse_rejects_malformed(text):
+    with pytest.raises(ValueError):
+        RowFilter.parse(text)
+
+
+def test_resolve_header_and_column_letter():
+    headers = ["Name", "C", "Qty"]
+    assert RowFilter("qty", "==", 1).resolve(headers) == 3
+    assert RowFilter("C", "==", 1).resolve(headers) == 2  # a header, not column C
+    assert RowFilter("col:C", "==", 1).resolve(headers) == 3
+    assert RowFilter("D", "==", 1).resolve(headers) is None
+
+
+# --- RowFilter._compare / matches ---
+
+
+def test_compare_numbers_stored_as_text():
+    assert RowFilter._compare("9", 100) == -1
+    assert RowFilter._compare(" 150 ", 100) == 1
+    assert RowFilter._compare("100", 100) == 0
+
+
+def test_compare_number_against_text_filter_value():
+    assert RowFilter._compare(5, "5") == 0
+    assert RowFilter._compare(12, "9") == 1
+
+
+def test_compare_incomparable_values():
+    assert RowFilter._compare("abc", 100) is None
+    assert RowFilter._compare(None, 100) is None
+    assert RowFilter._compare(datetime(2026, 1, 1), 5) is None
+
+
+def test_compare_text_is_case_insensitive():
+    assert RowFilter._compare(" North ", "north") == 0
+
+
+def test_compare_dates_and_iso_text():
+    assert RowFilter._compare("2026-07-02", datetime(2026, 7, 1)) == 1
+    assert RowFilter._compare(datetime(2026, 7, 1), datetime(2026, 7, 1)) == 0
+
+
+def test_numeric_filter_on_text_cells():
+    (f,) = RowFilter.parse("Qty >= 100")
+    assert not f.matches("9")
+    assert f.matches("150")
+    assert not f.matches("n/a")
+    assert not f.matches(None)
+
+
+def test_incomparable_values_only_match_not_equal():
+    assert RowFilter("Qty", "!=", 5).matches("abc")
+    assert not RowFilter("Qty", "==", 5).matches("abc")
+
+
+def test_between_and_in():
+    assert RowFilter("Qty", "between", (1, 10)).matches("10")
+    assert not RowFilter("Qty", "between", (1, 10)).matches(11)
+    assert RowFilter("Region", "in", ["North", "South"]).matches("south")
+    assert RowFilter("Region", "not in", ["North"]).matches("East")
+
+
+# --- RowMap ---
+
+
+def make_map(decisions, title="Data"):
+    """``decisions`` is a string of k (keep) / r (reject) for rows 1, 2, ..."""
+    row_map = RowMap(title)
+    for row, decision in enumerate(decisions, start=1):
+        if decision == "k":
+            row_map.keep(row)
+        else:
+            row_map.reject(row)
+    return row_map
+
+
+def test_identity_map_leaves_formulas_alone():
+    row_map = make_map("kkk")
+    assert row_map.identity
+    assert row_map.remap_formula("=A3+B2") == "=A3+B2"
+
+
+def test_remap_span():
+    row_map = make_map("krkrk")  # rows 1, 3, 5 -> 1, 2, 3
+    assert row_map._remap_span(1, 5) == (1, 3)
+    assert row_map._remap_span(2, 4) == (2, 2)
+    assert row_map._remap_span(2, 2) is None
+    assert row_map._remap_span(4, 8) == (3, 6)  # reaches past the last row read
+    assert row_map._remap_span(7, 9) == (5, 7)
+
+
+def test_remap_span_rejected_tail():
+    row_map = make_map("kkrr")
+    assert row_map._remap_span(3, 4) is None
+    assert row_map._remap_span(3, 6) == (3, 4)
+    assert row_map.get(5) == 3
+
+
+def test_remap_formula_cells_and_ranges():
+    row_map = make_map("krkrk")
+    assert row_map.remap_formula("=SUM(A2:A5)+A3") == "=SUM(A2:A3)+A2"
+    assert row_map.remap_formula("=$B$5*2") == "=$B$3*2"
+    assert row_map.remap_formula("=A2") == "=#REF!"
+    assert row_map.remap_formula("=SUM(A2:A2)") == "=SUM(#REF!)"
+
+
+def test_remap_formula_keeps_range_direction_and_whole_rows():
+    row_map = make_map("krkrk")
+    assert row_map.remap_formula("=SUM(5:3)") == "=SUM(3:2)"
+    assert row_map.remap_formula("=SUM(A:A)") == "=SUM(A:A)"
+
+
+def test_remap_formula_sheet_references():
+    row_map = make_map("krk", title="My Data")
+    assert row_map.remap_formula("='My Data'!A3+Other!A3") == "='My Data'!A2+Other!A3"
+    assert row_map.external_refs == 1
+
+
+def test_remap_formula_leaves_strings_and_names():
+    row_map = make_map("krk")
+    assert row_map.remap_formula('=IF(A3>0,"A3",Total)') == '=IF(A2>0,"A3",Total)'
+    assert row_map.remap_formula("plain text") == "plain text"